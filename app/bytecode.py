@@ -0,0 +1,626 @@
+import array
+import dataclasses
+import enum
+import typing
+
+from .expression import Expression, ExpressionVisitor, Literal, This, Variable
+from .grammar import TokenType
+from .lox import GlobalCell, GlobalEnvironment
+from .statement import FunctionStatement, Statement, StatementVisitor
+
+
+class OpCode(enum.IntEnum):
+    CONSTANT = 0
+    NIL = enum.auto()
+    TRUE = enum.auto()
+    FALSE = enum.auto()
+    POP = enum.auto()
+    GET_LOCAL = enum.auto()
+    SET_LOCAL = enum.auto()
+    GET_GLOBAL = enum.auto()
+    DEFINE_GLOBAL = enum.auto()
+    SET_GLOBAL = enum.auto()
+    GET_UPVALUE = enum.auto()
+    SET_UPVALUE = enum.auto()
+    GET_PROPERTY = enum.auto()
+    SET_PROPERTY = enum.auto()
+    CHECK_INSTANCE = enum.auto()
+    GET_SUPER = enum.auto()
+    EQUAL = enum.auto()
+    NOT_EQUAL = enum.auto()
+    GREATER = enum.auto()
+    GREATER_EQUAL = enum.auto()
+    LESS = enum.auto()
+    LESS_EQUAL = enum.auto()
+    ADD = enum.auto()
+    SUBTRACT = enum.auto()
+    MULTIPLY = enum.auto()
+    DIVIDE = enum.auto()
+    NOT = enum.auto()
+    NEGATE = enum.auto()
+    PRINT = enum.auto()
+    JUMP = enum.auto()
+    JUMP_IF_FALSE = enum.auto()
+    JUMP_IF_TRUE = enum.auto()
+    POP_JUMP_IF_FALSE = enum.auto()
+    CALL = enum.auto()
+    CLOSURE = enum.auto()
+    CLOSE_UPVALUE = enum.auto()
+    RETURN = enum.auto()
+    CLASS = enum.auto()
+    INHERIT = enum.auto()
+    METHOD = enum.auto()
+
+
+# instructions whose operand indexes the constant pool
+CONSTANT_OPERANDS = {
+    OpCode.CONSTANT,
+    OpCode.GET_GLOBAL,
+    OpCode.DEFINE_GLOBAL,
+    OpCode.SET_GLOBAL,
+    OpCode.GET_PROPERTY,
+    OpCode.SET_PROPERTY,
+    OpCode.GET_SUPER,
+    OpCode.CLASS,
+    OpCode.METHOD,
+}
+
+# instructions whose operand is an absolute offset in the code
+JUMP_OPERANDS = {
+    OpCode.JUMP,
+    OpCode.JUMP_IF_FALSE,
+    OpCode.JUMP_IF_TRUE,
+    OpCode.POP_JUMP_IF_FALSE,
+}
+
+# instructions with a plain number as operand
+NUMBER_OPERANDS = {
+    OpCode.GET_LOCAL,
+    OpCode.SET_LOCAL,
+    OpCode.GET_UPVALUE,
+    OpCode.SET_UPVALUE,
+    OpCode.CALL,
+}
+
+
+class Chunk:
+    """
+    Code of a single function.
+
+    Instructions and their operands are 32 bits words, `lines` has the source line of every word.
+    """
+
+    def __init__(self):
+        self.code = array.array("I")
+        self.lines = array.array("I")
+        self.constants: typing.List[typing.Any] = []
+
+        self._constant_indexes: typing.Dict[typing.Any, int] = {}
+
+    def write(self, word: int, line: int):
+        self.code.append(word)
+        self.lines.append(line)
+
+    def add_constant(self, value: typing.Any):
+        if isinstance(value, float):
+            # keep 0.0 and -0.0 apart
+            key = (float, repr(value))
+        elif isinstance(value, str):
+            key = (str, value)
+        else:
+            key = (type(value), id(value))
+
+        index = self._constant_indexes.get(key)
+        if index is None:
+            index = self._constant_indexes[key] = len(self.constants)
+            self.constants.append(value)
+
+        return index
+
+
+class FunctionPrototype:
+
+    def __init__(self, name: typing.Optional[str], arity: int):
+        self.name = name
+        self.arity = arity
+        self.upvalue_count = 0
+        self.chunk = Chunk()
+
+    def __str__(self):
+        if self.name is None:
+            return "<script>"
+
+        return f"<fn {self.name}>"
+
+
+class FunctionKind(enum.Enum):
+    SCRIPT = enum.auto()
+    FUNCTION = enum.auto()
+    METHOD = enum.auto()
+    INITIALIZER = enum.auto()
+
+
+@dataclasses.dataclass
+class Local:
+    name: str
+    depth: int
+    captured: bool = False
+
+
+@dataclasses.dataclass
+class FunctionState:
+    function: FunctionPrototype
+    kind: FunctionKind
+    enclosing: typing.Optional["FunctionState"]
+    locals: typing.List[Local] = dataclasses.field(default_factory=list)
+    upvalues: typing.List[typing.Tuple[bool, int]] = dataclasses.field(default_factory=list)
+    scope_depth: int = 0
+
+
+class BytecodeCompiler(ExpressionVisitor, StatementVisitor):
+    """
+    Lowers resolved statements into bytecode for the `VirtualMachine`.
+
+    Globals are left to the Resolver (a `depth` or `slot` of None), locals live on the VM stack
+    and are found by name, walking up the enclosing functions to capture upvalues.
+    """
+
+    def __init__(self, globals: GlobalEnvironment):
+        self.globals = globals
+
+        self.state: typing.Optional[FunctionState] = None
+        self.line = 1
+
+    def compile_script(self, statements: typing.List[Statement]):
+        self.begin_function(None, 0, FunctionKind.SCRIPT)
+
+        for statement in statements:
+            statement.visit(self)
+
+        self.emit(OpCode.NIL)
+        self.emit(OpCode.RETURN)
+
+        return self.end_function().function
+
+    def compile_expression(self, expression: Expression):
+        self.begin_function(None, 0, FunctionKind.SCRIPT)
+
+        expression.visit(self)
+        self.emit(OpCode.RETURN)
+
+        return self.end_function().function
+
+    def begin_function(self, name: typing.Optional[str], arity: int, kind: FunctionKind):
+        self.state = FunctionState(FunctionPrototype(name, arity), kind, self.state)
+
+        # slot 0 holds the callee, or the receiver of methods
+        receiver = "this" if kind in (FunctionKind.METHOD, FunctionKind.INITIALIZER) else ""
+        self.state.locals.append(Local(receiver, 0))
+
+    def end_function(self):
+        state = self.state
+        state.function.upvalue_count = len(state.upvalues)
+
+        self.state = state.enclosing
+        return state
+
+    def compile_function(self, function: FunctionStatement, kind: FunctionKind):
+        self.line = function.name.line
+        self.begin_function(function.name.lexeme, len(function.parameters), kind)
+        self.begin_scope()
+
+        for parameter in function.parameters:
+            self.add_local(parameter.lexeme)
+
+        for statement in function.body:
+            statement.visit(self)
+
+        self.emit_return()
+        state = self.end_function()
+
+        self.emit(OpCode.CLOSURE, self.make_constant(state.function))
+
+        for is_local, index in state.upvalues:
+            self.emit_word(int(is_local))
+            self.emit_word(index)
+
+    def begin_scope(self):
+        self.state.scope_depth += 1
+
+    def end_scope(self):
+        state = self.state
+        state.scope_depth -= 1
+
+        while state.locals and state.locals[-1].depth > state.scope_depth:
+            local = state.locals.pop()
+
+            if local.captured:
+                self.emit(OpCode.CLOSE_UPVALUE)
+            else:
+                self.emit(OpCode.POP)
+
+    def add_local(self, name: str):
+        self.state.locals.append(Local(name, self.state.scope_depth))
+
+    def resolve_local(self, state: FunctionState, name: str):
+        for index in range(len(state.locals) - 1, -1, -1):
+            if state.locals[index].name == name:
+                return index
+
+        return None
+
+    def resolve_upvalue(self, state: FunctionState, name: str):
+        if state.enclosing is None:
+            return None
+
+        local = self.resolve_local(state.enclosing, name)
+        if local is not None:
+            state.enclosing.locals[local].captured = True
+            return self.add_upvalue(state, True, local)
+
+        upvalue = self.resolve_upvalue(state.enclosing, name)
+        if upvalue is not None:
+            return self.add_upvalue(state, False, upvalue)
+
+        return None
+
+    def add_upvalue(self, state: FunctionState, is_local: bool, index: int):
+        upvalue = (is_local, index)
+
+        if upvalue in state.upvalues:
+            return state.upvalues.index(upvalue)
+
+        state.upvalues.append(upvalue)
+        return len(state.upvalues) - 1
+
+    def get_variable(self, name: str, is_global: bool):
+        self.access_variable(name, is_global, OpCode.GET_LOCAL, OpCode.GET_UPVALUE, OpCode.GET_GLOBAL)
+
+    def set_variable(self, name: str, is_global: bool):
+        self.access_variable(name, is_global, OpCode.SET_LOCAL, OpCode.SET_UPVALUE, OpCode.SET_GLOBAL)
+
+    def access_variable(self, name: str, is_global: bool, local_op: OpCode, upvalue_op: OpCode, global_op: OpCode):
+        if not is_global:
+            slot = self.resolve_local(self.state, name)
+            if slot is not None:
+                self.emit(local_op, slot)
+                return
+
+            upvalue = self.resolve_upvalue(self.state, name)
+            if upvalue is not None:
+                self.emit(upvalue_op, upvalue)
+                return
+
+        self.emit(global_op, self.make_global(name))
+
+    def define_variable(self, name: str, is_global: bool):
+        if is_global:
+            self.emit(OpCode.DEFINE_GLOBAL, self.make_global(name))
+        else:
+            # the value is left on the stack, where the local lives
+            self.add_local(name)
+
+    def make_constant(self, value: typing.Any):
+        return self.state.function.chunk.add_constant(value)
+
+    def make_global(self, name: str):
+        return self.make_constant(self.globals.cell(name))
+
+    def emit(self, op: OpCode, *operands: int):
+        self.emit_word(op)
+
+        for operand in operands:
+            self.emit_word(operand)
+
+    def emit_word(self, word: int):
+        self.state.function.chunk.write(word, self.line)
+
+    def emit_jump(self, op: OpCode):
+        self.emit(op, 0)
+        return len(self.state.function.chunk.code) - 1
+
+    def patch_jump(self, position: int):
+        code = self.state.function.chunk.code
+        code[position] = len(code)
+
+    def emit_return(self):
+        if self.state.kind == FunctionKind.INITIALIZER:
+            self.emit(OpCode.GET_LOCAL, 0)
+        else:
+            self.emit(OpCode.NIL)
+
+        self.emit(OpCode.RETURN)
+
+    def visit_expression(self, expression):
+        expression.expression.visit(self)
+        self.emit(OpCode.POP)
+
+    def visit_function(self, function):
+        is_global = function.slot is None
+
+        # declared first so that the function can refer to itself
+        if not is_global:
+            self.add_local(function.name.lexeme)
+
+        self.compile_function(function, FunctionKind.FUNCTION)
+
+        if is_global:
+            self.define_variable(function.name.lexeme, True)
+
+    def visit_if(self, if_):
+        if_.condition.visit(self)
+        else_jump = self.emit_jump(OpCode.POP_JUMP_IF_FALSE)
+
+        if_.then_branch.visit(self)
+
+        if if_.else_branch is None:
+            self.patch_jump(else_jump)
+            return
+
+        end_jump = self.emit_jump(OpCode.JUMP)
+        self.patch_jump(else_jump)
+
+        if_.else_branch.visit(self)
+        self.patch_jump(end_jump)
+
+    def visit_print(self, print_):
+        print_.expression.visit(self)
+        self.emit(OpCode.PRINT)
+
+    def visit_return(self, return_):
+        self.line = return_.keyword.line
+
+        if return_.value is None or self.state.kind == FunctionKind.INITIALIZER:
+            self.emit_return()
+            return
+
+        return_.value.visit(self)
+        self.emit(OpCode.RETURN)
+
+    def visit_while(self, while_):
+        loop_start = len(self.state.function.chunk.code)
+
+        while_.condition.visit(self)
+        exit_jump = self.emit_jump(OpCode.POP_JUMP_IF_FALSE)
+
+        while_.body.visit(self)
+        self.emit(OpCode.JUMP, loop_start)
+
+        self.patch_jump(exit_jump)
+
+    def visit_variable_statement(self, variable):
+        self.line = variable.name.line
+
+        if variable.initializer is None:
+            self.emit(OpCode.NIL)
+        else:
+            variable.initializer.visit(self)
+
+        self.define_variable(variable.name.lexeme, variable.slot is None)
+
+    def visit_block(self, block):
+        self.begin_scope()
+
+        for statement in block.statements:
+            statement.visit(self)
+
+        self.end_scope()
+
+    def visit_class(self, class_):
+        name = class_.name.lexeme
+        is_global = class_.slot is None
+
+        self.line = class_.name.line
+        self.emit(OpCode.CLASS, self.make_constant(name))
+        self.define_variable(name, is_global)
+
+        if class_.superclass is not None:
+            class_.superclass.visit(self)
+
+            # methods capture the superclass as an upvalue named `super`
+            self.begin_scope()
+            self.add_local("super")
+
+            self.get_variable(name, is_global)
+
+            self.line = class_.superclass.name.line
+            self.emit(OpCode.INHERIT)
+
+        self.get_variable(name, is_global)
+
+        for method in class_.methods:
+            if "init" == method.name.lexeme:
+                kind = FunctionKind.INITIALIZER
+            else:
+                kind = FunctionKind.METHOD
+
+            self.compile_function(method, kind)
+            self.emit(OpCode.METHOD, self.make_constant(method.name.lexeme))
+
+        self.emit(OpCode.POP)
+
+        if class_.superclass is not None:
+            self.end_scope()
+
+    def visit_literal(self, literal):
+        match literal.value:
+            case None: self.emit(OpCode.NIL)
+            case True: self.emit(OpCode.TRUE)
+            case False: self.emit(OpCode.FALSE)
+            case value: self.emit(OpCode.CONSTANT, self.make_constant(value))
+
+    def visit_grouping(self, grouping):
+        grouping.expression.visit(self)
+
+    def visit_unary(self, unary):
+        unary.right.visit(self)
+
+        self.line = unary.operator.line
+        match unary.operator.type:
+            case TokenType.MINUS: self.emit(OpCode.NEGATE)
+            case TokenType.BANG: self.emit(OpCode.NOT)
+
+    def visit_binary(self, binary):
+        binary.left.visit(self)
+        binary.right.visit(self)
+
+        self.line = binary.operator.line
+        match binary.operator.type:
+            case TokenType.PLUS: self.emit(OpCode.ADD)
+            case TokenType.MINUS: self.emit(OpCode.SUBTRACT)
+            case TokenType.SLASH: self.emit(OpCode.DIVIDE)
+            case TokenType.STAR: self.emit(OpCode.MULTIPLY)
+            case TokenType.GREATER: self.emit(OpCode.GREATER)
+            case TokenType.GREATER_EQUAL: self.emit(OpCode.GREATER_EQUAL)
+            case TokenType.LESS: self.emit(OpCode.LESS)
+            case TokenType.LESS_EQUAL: self.emit(OpCode.LESS_EQUAL)
+            case TokenType.BANG_EQUAL: self.emit(OpCode.NOT_EQUAL)
+            case TokenType.EQUAL_EQUAL: self.emit(OpCode.EQUAL)
+
+    def visit_variable_expression(self, variable):
+        self.line = variable.name.line
+        self.get_variable(variable.name.lexeme, variable.depth is None)
+
+    def visit_assign_expression(self, assign):
+        assign.value.visit(self)
+
+        self.line = assign.name.line
+        self.set_variable(assign.name.lexeme, assign.depth is None)
+
+    def visit_logical(self, logical):
+        logical.left.visit(self)
+
+        if logical.operator.type == TokenType.OR:
+            end_jump = self.emit_jump(OpCode.JUMP_IF_TRUE)
+        else:
+            end_jump = self.emit_jump(OpCode.JUMP_IF_FALSE)
+
+        self.emit(OpCode.POP)
+        logical.right.visit(self)
+
+        self.patch_jump(end_jump)
+
+    def visit_call(self, call):
+        call.callee.visit(self)
+
+        for argument in call.arguments:
+            argument.visit(self)
+
+        self.line = call.parenthesis.line
+        self.emit(OpCode.CALL, len(call.arguments))
+
+    def visit_get(self, get):
+        get.object.visit(self)
+
+        self.line = get.name.line
+        self.emit(OpCode.GET_PROPERTY, self.make_constant(get.name.lexeme))
+
+    def visit_set(self, set):
+        set.object.visit(self)
+
+        # the object is checked before the value is evaluated, unless the value cannot be observed
+        if not self.is_silent(set.value):
+            self.line = set.name.line
+            self.emit(OpCode.CHECK_INSTANCE)
+
+        set.value.visit(self)
+
+        self.line = set.name.line
+        self.emit(OpCode.SET_PROPERTY, self.make_constant(set.name.lexeme))
+
+    def visit_this(self, this):
+        self.line = this.keyword.line
+        self.get_variable("this", this.depth is None)
+
+    def visit_super(self, super_):
+        self.line = super_.keyword.line
+        self.get_variable("this", False)
+        self.get_variable("super", False)
+
+        self.line = super_.method.line
+        self.emit(OpCode.GET_SUPER, self.make_constant(super_.method.lexeme))
+
+    def is_silent(self, expression: Expression):
+        """expressions that can neither fail nor have side effects"""
+
+        if isinstance(expression, Literal):
+            return True
+
+        if isinstance(expression, (Variable, This)):
+            return expression.depth is not None
+
+        return False
+
+
+class Disassembler:
+    """
+    Human readable listing of a compiled function and the functions it contains.
+    """
+
+    def disassemble(self, function: FunctionPrototype):
+        lines = []
+        self._disassemble_function(function, lines)
+
+        return "\n".join(lines)
+
+    def _disassemble_function(self, function: FunctionPrototype, lines: typing.List[str]):
+        chunk = function.chunk
+
+        lines.append(f"== {function} ==")
+
+        offset = 0
+        while offset < len(chunk.code):
+            offset = self._disassemble_instruction(chunk, offset, lines)
+
+        for constant in chunk.constants:
+            if isinstance(constant, FunctionPrototype):
+                lines.append("")
+                self._disassemble_function(constant, lines)
+
+    def _disassemble_instruction(self, chunk: Chunk, offset: int, lines: typing.List[str]):
+        op = OpCode(chunk.code[offset])
+
+        if offset > 0 and chunk.lines[offset] == chunk.lines[offset - 1]:
+            line = "   |"
+        else:
+            line = f"{chunk.lines[offset]:4}"
+
+        prefix = f"{offset:04} {line} {op.name:<17}"
+
+        if op in CONSTANT_OPERANDS:
+            index = chunk.code[offset + 1]
+            lines.append(f"{prefix} {index:4} '{self._describe(chunk.constants[index])}'")
+            return offset + 2
+
+        if op in JUMP_OPERANDS:
+            lines.append(f"{prefix} {'':4} -> {chunk.code[offset + 1]:04}")
+            return offset + 2
+
+        if op in NUMBER_OPERANDS:
+            lines.append(f"{prefix} {chunk.code[offset + 1]:4}")
+            return offset + 2
+
+        if op == OpCode.CLOSURE:
+            index = chunk.code[offset + 1]
+            function = chunk.constants[index]
+            lines.append(f"{prefix} {index:4} '{function}'")
+
+            offset += 2
+            for _ in range(function.upvalue_count):
+                kind = "local" if chunk.code[offset] else "upvalue"
+                lines.append(f"{offset:04}    |   {kind} {chunk.code[offset + 1]}")
+                offset += 2
+
+            return offset
+
+        lines.append(prefix.rstrip())
+        return offset + 1
+
+    def _describe(self, value: typing.Any):
+        if isinstance(value, GlobalCell):
+            return value.name
+
+        if isinstance(value, float):
+            return str(value).removesuffix(".0")
+
+        return str(value)
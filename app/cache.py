@@ -0,0 +1,164 @@
+import dataclasses
+import glob
+import hashlib
+import os
+import pickle
+import sys
+import typing
+
+from .statement import Statement
+
+FORMAT_VERSION = 2
+MAGIC = b"LOXC"
+
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+DEFAULT_MAX_ENTRIES = 256
+
+
+def compute_fingerprint():
+    digest = hashlib.sha256(f"{FORMAT_VERSION}:{sys.version}".encode())
+
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(__file__), "*.py"))):
+        with open(path, "rb") as file:
+            digest.update(file.read())
+
+    return digest.digest()
+
+
+@dataclasses.dataclass
+class Program:
+    statements: typing.List[Statement]
+
+
+class ProgramCache:
+    """
+    Parsed and resolved programs stored as `<directory>/<sha256 of the source>.bin`, and the
+    Python modules transpiled from them as `.O<level>.py`, one per optimization level.
+
+    Entries are tagged with a fingerprint of the interpreter sources, any change to them
+    invalidates the whole cache. The least recently used entries are evicted once the
+    directory grows over `max_size` bytes or `max_entries` files.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_size: int = DEFAULT_MAX_SIZE,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        self.directory = directory
+        self.max_size = max_size
+        self.max_entries = max_entries
+
+        self._header = MAGIC + compute_fingerprint()
+        self._module_header = f"# {self._header.hex()}\n".encode()
+
+    def path_of(self, source: str, extension: str = "bin"):
+        name = hashlib.sha256(source.encode()).hexdigest()
+
+        return os.path.join(self.directory, f"{name}.{extension}")
+
+    def load(self, source: str):
+        path = self.path_of(source)
+
+        try:
+            with open(path, "rb") as file:
+                if file.read(len(self._header)) != self._header:
+                    raise ValueError("stale cache entry")
+
+                program = pickle.load(file)
+
+            # used as the access time for the eviction
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            self._remove(path)
+            return None
+
+        if not isinstance(program, Program):
+            return None
+
+        return program
+
+    def store(self, source: str, statements: typing.List[Statement]):
+        # the resolution is stored on the nodes themselves
+        program = Program(statements)
+
+        def write(file: typing.BinaryIO):
+            file.write(self._header)
+            pickle.dump(program, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self._write(self.path_of(source), write)
+
+    def load_module(self, source: str, optimization: int = 0):
+        """Python module generated from the source at an optimization level, stored next to the programs."""
+
+        path = self.path_of(source, f"O{optimization}.py")
+
+        try:
+            with open(path, "rb") as file:
+                if file.readline() != self._module_header:
+                    raise ValueError("stale cache entry")
+
+                module = file.read().decode()
+
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            self._remove(path)
+            return None
+
+        return module
+
+    def store_module(self, source: str, module: str, optimization: int = 0):
+        def write(file: typing.BinaryIO):
+            file.write(self._module_header)
+            file.write(module.encode())
+
+        self._write(self.path_of(source, f"O{optimization}.py"), write)
+
+    def _write(self, path: str, write: typing.Callable[[typing.BinaryIO], None]):
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+
+            with open(temporary_path, "wb") as file:
+                write(file)
+
+            os.replace(temporary_path, path)
+        except (OSError, RecursionError, pickle.PicklingError):
+            self._remove(temporary_path)
+            return
+
+        self.evict()
+
+    def evict(self):
+        entries = []
+
+        paths = glob.glob(os.path.join(self.directory, "*.bin")) + glob.glob(os.path.join(self.directory, "*.py"))
+
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort(reverse=True)
+
+        total_size = 0
+        for index, (_, size, path) in enumerate(entries):
+            total_size += size
+
+            if total_size > self.max_size or index >= self.max_entries:
+                self._remove(path)
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
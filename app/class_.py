@@ -6,6 +6,37 @@ from .function import Callable, LoxFunction
 from .grammar import Token
 
 
+class Shape:
+    """
+    Layout of the fields of instances which gained the same fields in the same order.
+    """
+
+    __slots__ = ("indexes", "transitions")
+
+    def __init__(self, indexes: typing.Optional[typing.Dict[str, int]] = None):
+        self.indexes = indexes if indexes is not None else {}
+        self.transitions: typing.Dict[str, Shape] = {}
+
+    def add(self, name: str) -> "Shape":
+        """the shape of instances of this one that gain field `name`, shared by all of them"""
+
+        shape = self.transitions.get(name)
+        if shape is None:
+            shape = Shape({**self.indexes, name: len(self.indexes)})
+            self.transitions[name] = shape
+
+        return shape
+
+    def store(self, name: str) -> typing.Tuple[int, typing.Optional["Shape"]]:
+        """the index of field `name`, or the shape to move to when it is a new field"""
+
+        index = self.indexes.get(name)
+        if index is not None:
+            return index, None
+
+        return len(self.indexes), self.add(name)
+
+
 @dataclasses.dataclass
 class LoxClass(Callable):
 
@@ -13,54 +44,101 @@ class LoxClass(Callable):
     superclass: typing.Optional["LoxClass"]
     methods: typing.Dict[str, LoxFunction]
 
-    def arity(self):
-        initializer = self.find_method("init")
-        if initializer is not None:
-            return initializer.arity()
+    # inherited and own methods flattened into one table, so a lookup never walks the superclass chain
+    vtable: typing.Dict[str, LoxFunction] = dataclasses.field(init=False, repr=False, compare=False)
+    initializer: typing.Optional[LoxFunction] = dataclasses.field(init=False, repr=False, compare=False)
+    arity: int = dataclasses.field(init=False, repr=False, compare=False)
+
+    # the shape new instances start with, so a shape also tells their class
+    shape: Shape = dataclasses.field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.shape = Shape()
+
+        self.vtable = {}
+        if self.superclass is not None:
+            self.vtable.update(self.superclass.vtable)
+
+        self.vtable.update(self.methods)
+        self._cache_initializer()
 
-        return 0
+    def inherit(self, superclass: "LoxClass"):
+        """copy down the superclass' methods, before any of the class' own are defined"""
+
+        self.superclass = superclass
+        self.vtable.update(superclass.vtable)
+        self._cache_initializer()
+
+    def define_method(self, name: str, method: LoxFunction):
+        self.methods[name] = method
+        self.vtable[name] = method
+        self._cache_initializer()
+
+    def _cache_initializer(self):
+        self.initializer = self.vtable.get("init")
+        self.arity = 0 if self.initializer is None else self.initializer.arity
 
     def call(self, interpreter, arguments):
         instance = LoxInstance(self)
 
-        initializer = self.find_method("init")
+        initializer = self.initializer
         if initializer is not None:
-            initializer.bind(instance).call(interpreter, arguments)
+            initializer.invoke(interpreter, instance, arguments)
 
         return instance
 
     def find_method(self, name: str):
-        method = self.methods.get(name)
-        if method is not None:
-            return method
-        
-        if self.superclass:
-            return self.superclass.find_method(name)
-
-        return None
+        return self.vtable.get(name)
 
     def __str__(self):
         return self.name
 
 
-@dataclasses.dataclass
 class LoxInstance:
 
-    klass: LoxClass
-    fields: typing.Dict[str, typing.Any] = dataclasses.field(default_factory=lambda: {})
+    __slots__ = ("klass", "shape", "values")
+
+    def __init__(self, klass: LoxClass):
+        self.klass = klass
+
+        # field values, laid out by the shape
+        self.shape = klass.shape
+        self.values: typing.List[typing.Any] = []
 
     def get(self, name: Token):
-        if name.lexeme in self.fields:
-            return self.fields[name.lexeme]
+        index, method = self.look_up(name)
+
+        if method is None:
+            return self.values[index]
+
+        return method.bind(self)
+
+    def look_up(self, name: Token) -> typing.Tuple[int, typing.Optional[LoxFunction]]:
+        """the index of field `name` in `values`, or the method it names when there is no such field"""
+
+        index = self.shape.indexes.get(name.lexeme)
+        if index is not None:
+            return index, None
 
         method = self.klass.find_method(name.lexeme)
         if method is not None:
-            return method.bind(self)
+            return -1, method
 
         raise RuntimeError(name, f"Undefined property '{name.lexeme}'.")
 
     def set(self, name: Token, value: typing.Any):
-        self.fields[name.lexeme] = value
+        self.set_field(name.lexeme, value)
+
+    def set_field(self, name: str, value: typing.Any):
+        index, transition = self.shape.store(name)
+
+        if transition is None:
+            self.values[index] = value
+            return
+
+        # a new field moves the instance to the next shape
+        self.shape = transition
+        self.values.append(value)
 
     def __str__(self):
         return f"{self.klass.name} instance"
@@ -0,0 +1,665 @@
+import typing
+
+from .class_ import LoxClass, LoxInstance
+from .error import RuntimeError
+from .evaluation import Interpreter
+from .expression import Call, Expression, ExpressionVisitor
+from .function import Callable, LoxFunction, TailCall
+from .grammar import Token, TokenType
+from .lox import UNDEFINED, Environment, GlobalEnvironment, Lox
+from .statement import FunctionStatement, Statement, StatementVisitor
+
+# signature of compiled nodes, statements return None or a `(value,)` completion on `return`
+Compiled = typing.Callable[[Environment | GlobalEnvironment], typing.Any]
+
+
+class CompiledFunction(LoxFunction):
+
+    __slots__ = ("_body",)
+
+    def __init__(
+        self,
+        declaration: FunctionStatement,
+        closure: Environment | GlobalEnvironment,
+        is_initializer: bool,
+        body: Compiled,
+        receiver: typing.Optional[LoxInstance] = None,
+    ):
+        super().__init__(declaration, closure, is_initializer, receiver)
+
+        self._body = body
+
+    def run(self, interpreter, environment):
+        return self._body(environment)
+
+    def bind(self, instance: LoxInstance):
+        return CompiledFunction(self._declaration, self._closure, self._is_initializer, self._body, instance)
+
+
+class ClosureCompiler(ExpressionVisitor, StatementVisitor):
+    """
+    Compiles a resolved AST into a tree of specialized Python closures.
+
+    Everything known before running (operators, resolved slots, global cells, arities of
+    call sites) is decided once here instead of on every evaluation.
+    """
+
+    def __init__(self, interpreter: Interpreter):
+        self.interpreter = interpreter
+        self.globals = interpreter.globals
+
+    def compile(self, statement_or_expression: Statement | Expression) -> Compiled:
+        return statement_or_expression.visit(self)
+
+    def compile_statements(self, statements: typing.List[Statement]) -> Compiled:
+        compiled = [self.compile(statement) for statement in statements]
+
+        if len(compiled) == 1:
+            return compiled[0]
+
+        def run_statements(environment):
+            for statement in compiled:
+                completion = statement(environment)
+
+                if completion is not None:
+                    return completion
+
+        return run_statements
+
+    def compile_function(self, function: FunctionStatement):
+        return self.compile_statements(function.body)
+
+    def compile_store(self, name: Token, slot: typing.Optional[int]):
+        if slot is None:
+            cell = self.globals.cell(name.lexeme)
+
+            def store_global(environment, value):
+                cell.value = value
+
+            return store_global
+
+        def store_local(environment, value):
+            environment.values[slot] = value
+
+        return store_local
+
+    def compile_get(self, name: Token, depth: typing.Optional[int], slot: int) -> Compiled:
+        if depth is None:
+            cell = self.globals.cell(name.lexeme)
+
+            def get_global(environment):
+                value = cell.value
+                if value is UNDEFINED:
+                    raise RuntimeError(name, f"Undefined variable '{name.lexeme}'.")
+
+                return value
+
+            return get_global
+
+        if depth == 0:
+            return lambda environment: environment.values[slot]
+
+        if depth == 1:
+            return lambda environment: environment.enclosing.values[slot]
+
+        if depth == 2:
+            return lambda environment: environment.enclosing.enclosing.values[slot]
+
+        def get_local(environment):
+            for _ in range(depth):
+                environment = environment.enclosing
+
+            return environment.values[slot]
+
+        return get_local
+
+    def visit_expression(self, expression):
+        compiled = self.compile(expression.expression)
+
+        def expression_statement(environment):
+            compiled(environment)
+
+        return expression_statement
+
+    def visit_function(self, function):
+        body = self.compile_function(function)
+        store = self.compile_store(function.name, function.slot)
+
+        def function_statement(environment):
+            store(environment, CompiledFunction(function, environment, False, body))
+
+        return function_statement
+
+    def visit_if(self, if_):
+        condition = self.compile(if_.condition)
+        then_branch = self.compile(if_.then_branch)
+
+        if if_.else_branch is None:
+            def if_then(environment):
+                value = condition(environment)
+
+                if value is not None and value is not False:
+                    return then_branch(environment)
+
+            return if_then
+
+        else_branch = self.compile(if_.else_branch)
+
+        def if_then_else(environment):
+            value = condition(environment)
+
+            if value is not None and value is not False:
+                return then_branch(environment)
+
+            return else_branch(environment)
+
+        return if_then_else
+
+    def visit_print(self, print_):
+        expression = self.compile(print_.expression)
+        stringify = self.interpreter.stringify
+
+        def print_statement(environment):
+            print(stringify(expression(environment)))
+
+        return print_statement
+
+    def visit_return(self, return_):
+        if return_.value is None:
+            completion = (None,)
+            return lambda environment: completion
+
+        if return_.tail_call and self.interpreter.tail_calls:
+            return self.compile_tail_call(typing.cast(Call, return_.value))
+
+        value = self.compile(return_.value)
+        return lambda environment: (value(environment),)
+
+    def compile_tail_call(self, call: Call) -> Compiled:
+        callee = self.compile(call.callee)
+        arguments = [self.compile(argument) for argument in call.arguments]
+        parenthesis = call.parenthesis
+
+        def tail_call(environment):
+            function = callee(environment)
+            values = [argument(environment) for argument in arguments]
+
+            if not isinstance(function, Callable):
+                raise RuntimeError(parenthesis, "Can only call functions and classes.")
+
+            if len(values) != function.arity:
+                raise RuntimeError(parenthesis, f"Expected {function.arity} arguments but got {len(values)}.")
+
+            return TailCall(function, None, values)
+
+        return tail_call
+
+    def visit_while(self, while_):
+        condition = self.compile(while_.condition)
+        body = self.compile(while_.body)
+
+        def while_statement(environment):
+            while True:
+                value = condition(environment)
+
+                if value is None or value is False:
+                    return None
+
+                completion = body(environment)
+                if completion is not None:
+                    return completion
+
+        return while_statement
+
+    def visit_variable_statement(self, variable):
+        store = self.compile_store(variable.name, variable.slot)
+
+        if variable.initializer is None:
+            return lambda environment: store(environment, None)
+
+        value = self.compile(variable.initializer)
+
+        def variable_statement(environment):
+            store(environment, value(environment))
+
+        return variable_statement
+
+    def visit_block(self, block):
+        statements = self.compile_statements(block.statements)
+
+        # its variables are in the enclosing frame
+        if block.inline:
+            return statements
+
+        size = block.frame_size
+
+        def block_statement(environment):
+            return statements(Environment(environment, [None] * size))
+
+        return block_statement
+
+    def visit_class(self, class_):
+        name = class_.name.lexeme
+
+        superclass_expression = None
+        if class_.superclass is not None:
+            superclass_expression = self.compile(class_.superclass)
+
+        methods = [
+            (method, self.compile_function(method), "init" == method.name.lexeme)
+            for method in class_.methods
+        ]
+
+        store = self.compile_store(class_.name, class_.slot)
+
+        def class_statement(environment):
+            superclass = None
+            if superclass_expression is not None:
+                superclass = superclass_expression(environment)
+
+                if not isinstance(superclass, LoxClass):
+                    raise RuntimeError(class_.superclass.name, "Superclass must be a class.")
+
+            store(environment, None)
+
+            closure = environment
+            if superclass_expression is not None:
+                closure = Environment(environment, [superclass])
+
+            klass = LoxClass(name, superclass, {
+                method.name.lexeme: CompiledFunction(method, closure, is_initializer, body)
+                for method, body, is_initializer in methods
+            })
+
+            store(environment, klass)
+
+        return class_statement
+
+    def visit_literal(self, literal):
+        value = literal.value
+        return lambda environment: value
+
+    def visit_grouping(self, grouping):
+        return self.compile(grouping.expression)
+
+    def visit_unary(self, unary):
+        operator = unary.operator
+        right = self.compile(unary.right)
+
+        match operator.type:
+            case TokenType.BANG:
+                def not_(environment):
+                    value = right(environment)
+                    return value is None or value is False
+
+                return not_
+
+            case TokenType.MINUS:
+                def negate(environment):
+                    value = right(environment)
+
+                    if isinstance(value, float):
+                        return -value
+
+                    raise RuntimeError(operator, "Operand must be a number.")
+
+                return negate
+
+        raise NotImplementedError("unreachable")
+
+    def visit_binary(self, binary):
+        operator = binary.operator
+        left = self.compile(binary.left)
+        right = self.compile(binary.right)
+
+        match operator.type:
+            case TokenType.PLUS:
+                def add(environment):
+                    a = left(environment)
+                    b = right(environment)
+
+                    if isinstance(a, float) and isinstance(b, float):
+                        return a + b
+
+                    if isinstance(a, str) and isinstance(b, str):
+                        return a + b
+
+                    raise RuntimeError(operator, "Operands must be two numbers or two strings.")
+
+                return add
+
+            case TokenType.BANG_EQUAL:
+                def not_equal(environment):
+                    a = left(environment)
+                    b = right(environment)
+
+                    if a is None:
+                        return b is not None
+
+                    return not a == b
+
+                return not_equal
+
+            case TokenType.EQUAL_EQUAL:
+                def equal(environment):
+                    a = left(environment)
+                    b = right(environment)
+
+                    if a is None:
+                        return b is None
+
+                    return a == b
+
+                return equal
+
+            case TokenType.MINUS:
+                def subtract(environment):
+                    a = left(environment)
+                    b = right(environment)
+
+                    if isinstance(a, float) and isinstance(b, float):
+                        return a - b
+
+                    raise RuntimeError(operator, "Operand must be a number.")
+
+                return subtract
+
+            case TokenType.SLASH:
+                def divide(environment):
+                    a = left(environment)
+                    b = right(environment)
+
+                    if isinstance(a, float) and isinstance(b, float):
+                        return a / b
+
+                    raise RuntimeError(operator, "Operand must be a number.")
+
+                return divide
+
+            case TokenType.STAR:
+                def multiply(environment):
+                    a = left(environment)
+                    b = right(environment)
+
+                    if isinstance(a, float) and isinstance(b, float):
+                        return a * b
+
+                    raise RuntimeError(operator, "Operand must be a number.")
+
+                return multiply
+
+            case TokenType.GREATER:
+                def greater(environment):
+                    a = left(environment)
+                    b = right(environment)
+
+                    if isinstance(a, float) and isinstance(b, float):
+                        return a > b
+
+                    raise RuntimeError(operator, "Operand must be a number.")
+
+                return greater
+
+            case TokenType.GREATER_EQUAL:
+                def greater_equal(environment):
+                    a = left(environment)
+                    b = right(environment)
+
+                    if isinstance(a, float) and isinstance(b, float):
+                        return a >= b
+
+                    raise RuntimeError(operator, "Operand must be a number.")
+
+                return greater_equal
+
+            case TokenType.LESS:
+                def less(environment):
+                    a = left(environment)
+                    b = right(environment)
+
+                    if isinstance(a, float) and isinstance(b, float):
+                        return a < b
+
+                    raise RuntimeError(operator, "Operand must be a number.")
+
+                return less
+
+            case TokenType.LESS_EQUAL:
+                def less_equal(environment):
+                    a = left(environment)
+                    b = right(environment)
+
+                    if isinstance(a, float) and isinstance(b, float):
+                        return a <= b
+
+                    raise RuntimeError(operator, "Operand must be a number.")
+
+                return less_equal
+
+        raise NotImplementedError("unreachable")
+
+    def visit_variable_expression(self, variable):
+        return self.compile_get(variable.name, variable.depth, variable.slot)
+
+    def visit_assign_expression(self, assign):
+        name = assign.name
+        value = self.compile(assign.value)
+        depth = assign.depth
+        slot = assign.slot
+
+        if depth is None:
+            cell = self.globals.cell(name.lexeme)
+
+            def assign_global(environment):
+                result = value(environment)
+
+                if cell.value is UNDEFINED:
+                    raise RuntimeError(name, f"Undefined variable '{name.lexeme}'.")
+
+                cell.value = result
+                return result
+
+            return assign_global
+
+        def assign_local(environment):
+            result = value(environment)
+
+            target = environment
+            for _ in range(depth):
+                target = target.enclosing
+
+            target.values[slot] = result
+            return result
+
+        return assign_local
+
+    def visit_logical(self, logical):
+        left = self.compile(logical.left)
+        right = self.compile(logical.right)
+
+        if logical.operator.type == TokenType.OR:
+            def or_(environment):
+                value = left(environment)
+
+                if value is not None and value is not False:
+                    return value
+
+                return right(environment)
+
+            return or_
+
+        def and_(environment):
+            value = left(environment)
+
+            if value is None or value is False:
+                return value
+
+            return right(environment)
+
+        return and_
+
+    def visit_call(self, call):
+        callee = self.compile(call.callee)
+        arguments = [self.compile(argument) for argument in call.arguments]
+        parenthesis = call.parenthesis
+        interpreter = self.interpreter
+
+        def check(function):
+            if not isinstance(function, Callable):
+                raise RuntimeError(parenthesis, "Can only call functions and classes.")
+
+            if len(arguments) != function.arity:
+                raise RuntimeError(parenthesis, f"Expected {function.arity} arguments but got {len(arguments)}.")
+
+        match len(arguments):
+            case 0:
+                def call_0(environment):
+                    function = callee(environment)
+                    check(function)
+
+                    return function.call(interpreter, [])
+
+                return call_0
+
+            case 1:
+                argument, = arguments
+
+                def call_1(environment):
+                    function = callee(environment)
+                    values = [argument(environment)]
+                    check(function)
+
+                    return function.call(interpreter, values)
+
+                return call_1
+
+            case 2:
+                first, second = arguments
+
+                def call_2(environment):
+                    function = callee(environment)
+                    values = [first(environment), second(environment)]
+                    check(function)
+
+                    return function.call(interpreter, values)
+
+                return call_2
+
+        def call_n(environment):
+            function = callee(environment)
+            values = [argument(environment) for argument in arguments]
+            check(function)
+
+            return function.call(interpreter, values)
+
+        return call_n
+
+    def visit_get(self, get):
+        object = self.compile(get.object)
+        name = get.name
+
+        # inline cache, where the property is for instances of `cached_shape`
+        cached_shape = None
+        index = -1
+        method = None
+
+        def get_property(environment):
+            nonlocal cached_shape, index, method
+
+            instance = object(environment)
+
+            if not isinstance(instance, LoxInstance):
+                raise RuntimeError(name, "Only instances have properties.")
+
+            if instance.shape is not cached_shape:
+                index, method = instance.look_up(name)
+                cached_shape = instance.shape
+
+            if method is None:
+                return instance.values[index]
+
+            return method.bind(instance)
+
+        return get_property
+
+    def visit_set(self, set):
+        object = self.compile(set.object)
+        value = self.compile(set.value)
+        name = set.name
+
+        # inline cache, where the field is for instances of `cached_shape`
+        cached_shape = None
+        index = -1
+        transition = None
+
+        def set_property(environment):
+            nonlocal cached_shape, index, transition
+
+            instance = object(environment)
+
+            if not isinstance(instance, LoxInstance):
+                raise RuntimeError(name, "Only instances have properties.")
+
+            result = value(environment)
+
+            if instance.shape is not cached_shape:
+                index, transition = instance.shape.store(name.lexeme)
+                cached_shape = instance.shape
+
+            if transition is None:
+                instance.values[index] = result
+            else:
+                instance.shape = transition
+                instance.values.append(result)
+
+            return result
+
+        return set_property
+
+    def visit_this(self, this):
+        return self.compile_get(this.keyword, this.depth, this.slot)
+
+    def visit_super(self, super_):
+        method = super_.method
+        depth = super_.depth
+
+        def get_super(environment):
+            for _ in range(depth - 1):
+                environment = environment.enclosing
+
+            # `super` is alone in its scope, around the frame of the method where `this` is first
+            instance = environment.values[0]
+            superclass = environment.enclosing.values[0]
+
+            function = superclass.find_method(method.lexeme)
+            if function is None:
+                raise RuntimeError(method, f"Undefined property '{method.lexeme}'.")
+
+            return function.bind(instance)
+
+        return get_super
+
+
+class ClosureInterpreter(Interpreter):
+    """
+    Engine running programs compiled by the `ClosureCompiler`.
+    """
+
+    def __init__(self):
+        super().__init__()
+
+        self.compiler = ClosureCompiler(self)
+
+    def interpret(self, statements: typing.List[Statement]):
+        try:
+            for statement in statements:
+                self.compiler.compile(statement)(self.globals)
+        except RuntimeError as error:
+            Lox.report_runtime(error.token.line, str(error))
+
+    def interpret_expression(self, expression: Expression):
+        try:
+            value = self.compiler.compile(expression)(self.globals)
+            print(self.stringify(value))
+        except RuntimeError as error:
+            Lox.report_runtime(error.token.line, str(error))
@@ -1,22 +1,44 @@
+import collections
 import time
 import typing
 
 from .class_ import LoxClass, LoxInstance
 from .error import RuntimeError
-from .expression import Expression, ExpressionVisitor
-from .function import Callable, LoxFunction, NativeFunction, Return
+from .expression import (
+    Assign,
+    Binary,
+    Call,
+    Expression,
+    ExpressionVisitor,
+    FieldGet,
+    Get,
+    NumberBinary,
+    Set,
+    StringBinary,
+    This,
+    Variable,
+)
+from .function import Callable, LoxFunction, NativeFunction, TailCall
 from .grammar import Token, TokenType
-from .lox import Environment, Lox
-from .statement import Statement, StatementVisitor
+from .lox import UNDEFINED, Environment, GlobalEnvironment, Lox
+from .statement import FunctionStatement, Statement, StatementVisitor
 
 
 class Interpreter(ExpressionVisitor, StatementVisitor):
+    """
+    Tree-walking engine. Executing a statement yields None, or a `(value,)` completion
+    when a `return` ran, which enclosing statements pass up to the function call.
+    """
 
     def __init__(self):
-        self.globals = Environment()
-        self.environment = self.globals
+        self.globals = GlobalEnvironment()
+        self.environment: Environment | GlobalEnvironment = self.globals
 
-        self.locals: typing.Dict[int, int] = {}
+        # calls in tail position reuse the frame of the function returning them
+        self.tail_calls = True
+
+        # nodes rewritten to a specialized variant, and back
+        self.counters: typing.Counter[str] = collections.Counter()
 
         self.globals.define("clock", NativeFunction("clock", 0, lambda: float(int(time.time()))))
 
@@ -41,16 +63,17 @@ class Interpreter(ExpressionVisitor, StatementVisitor):
             self.environment = environment
 
             for statement in statements:
-                self.execute(statement)
+                completion = statement.visit(self)
+
+                if completion is not None:
+                    return completion
         finally:
             self.environment = previous
 
-    def execute(self, statement: Statement):
-        statement.visit(self)
+        return None
 
-    def resolve(self, expression: Expression, depth: int):
-        self.locals[id(expression)] = depth
-        # print("resolve", expression, id(expression), depth)
+    def execute(self, statement: Statement):
+        return statement.visit(self)
 
     def evaluate(self, expression: Expression):
         return expression.visit(self)
@@ -59,15 +82,26 @@ class Interpreter(ExpressionVisitor, StatementVisitor):
         self.evaluate(expression.expression)
 
     def visit_function(self, function):
-        lox_function = LoxFunction(function, self.environment, False)
+        lox_function = self.create_function(function, self.environment, False)
+
+        self.define(function.name, function.slot, lox_function)
 
-        self.environment.define(function.name.lexeme, lox_function)
+    def create_function(self, declaration: FunctionStatement, closure: Environment | GlobalEnvironment, is_initializer: bool):
+        """the function value of `declaration`, engines running bodies their own way give a subclass"""
+
+        return LoxFunction(declaration, closure, is_initializer)
+
+    def preload_calls(self, declaration: FunctionStatement, calls: int):
+        """the calls a type profile recorded for `declaration`, for engines compiling the hot functions"""
 
     def visit_if(self, if_):
         if self.is_truthy(self.evaluate(if_.condition)):
-            self.execute(if_.then_branch)
-        elif if_.else_branch is not None:
-            self.execute(if_.else_branch)
+            return self.execute(if_.then_branch)
+
+        if if_.else_branch is not None:
+            return self.execute(if_.else_branch)
+
+        return None
 
     def visit_print(self, print_):
         value = self.evaluate(print_.expression)
@@ -76,23 +110,70 @@ class Interpreter(ExpressionVisitor, StatementVisitor):
     def visit_return(self, return_):
         value = None
         if return_.value is not None:
+            if return_.tail_call and self.tail_calls:
+                return self.tail_call(typing.cast(Call, return_.value))
+
             value = self.evaluate(return_.value)
 
-        raise Return(value)
+        return (value,)
+
+    def tail_call(self, call: Call):
+        """evaluate the callee and arguments of `call`, leaving the call to the returning function"""
+
+        receiver = None
+
+        if type(call.callee) is Get:
+            get = call.callee
+            receiver = self.evaluate(get.object)
+
+            callee = self.look_up_property(get, receiver)
+            if callee is None:
+                callee = receiver.values[get.index]
+                receiver = None
+        else:
+            callee = self.evaluate(call.callee)
+
+        arguments = [
+            self.evaluate(argument)
+            for argument in call.arguments
+        ]
+
+        self.check_call(call, callee, arguments)
+        return TailCall(callee, receiver, arguments)
 
     def visit_while(self, while_):
         while self.is_truthy(self.evaluate(while_.condition)):
-            self.execute(while_.body)
+            completion = self.execute(while_.body)
+
+            if completion is not None:
+                return completion
+
+        return None
 
     def visit_variable_statement(self, variable):
         value = None
         if variable.initializer is not None:
             value = self.evaluate(variable.initializer)
 
-        self.environment.define(variable.name.lexeme, value)
+        self.define(variable.name, variable.slot, value)
+
+    def define(self, name: Token, slot: typing.Optional[int], value: typing.Any):
+        if slot is None:
+            self.globals.define(name.lexeme, value)
+        else:
+            self.environment.values[slot] = value
 
     def visit_block(self, block):
-        self.execute_block(block.statements, self.environment.inner())
+        if block.inline:
+            for statement in block.statements:
+                completion = statement.visit(self)
+
+                if completion is not None:
+                    return completion
+
+            return None
+
+        return self.execute_block(block.statements, Environment(self.environment, [None] * block.frame_size))
 
     def visit_literal(self, literal):
         return literal.value
@@ -101,124 +182,187 @@ class Interpreter(ExpressionVisitor, StatementVisitor):
         return self.evaluate(grouping.expression)
 
     def visit_unary(self, unary):
-        right = self.evaluate(unary.right)
-
-        match unary.operator.type:
-            case TokenType.BANG: return not self.is_truthy(right)
-
-            case TokenType.MINUS:
-                self.check_number_operand(unary.operator, right)
-                return -right
-
-        raise NotImplementedError("unreachable")
+        return unary.operation(unary.operator, self.evaluate(unary.right))
 
     def visit_binary(self, binary):
         left = self.evaluate(binary.left)
         right = self.evaluate(binary.right)
 
-        match binary.operator.type:
-            case TokenType.MINUS:
-                self.check_number_operands(binary.operator, left, right)
-                return left - right
+        if not binary.generic:
+            self.specialize_binary(binary, left, right)
 
-            case TokenType.PLUS:
-                if isinstance(left, float) and isinstance(right, float):
-                    return left + right
+        return binary.operation(binary.operator, left, right)
 
-                if isinstance(left, str) and isinstance(right, str):
-                    return left + right
+    def specialize_binary(self, binary: Binary, left: typing.Any, right: typing.Any):
+        """rewrite `binary` to the variant for the operands it saw, for as long as they keep their types"""
 
-                raise RuntimeError(binary.operator, "Operands must be two numbers or two strings.")
+        if type(left) is float and type(right) is float:
+            binary.__class__ = NumberBinary
+        elif type(left) is str and type(right) is str and binary.operator.type == TokenType.PLUS:
+            binary.__class__ = StringBinary
+        else:
+            binary.generic = True
+            return
+
+        self.counters["specialized"] += 1
+
+    def visit_number_binary(self, binary):
+        left = binary.left.visit(self)
+        right = binary.right.visit(self)
 
-            case TokenType.SLASH:
-                self.check_number_operands(binary.operator, left, right)
-                return left / right
+        if type(left) is float and type(right) is float:
+            return binary.number_operation(left, right)
 
-            case TokenType.STAR:
-                self.check_number_operands(binary.operator, left, right)
-                return left * right
+        return self.deoptimize_binary(binary, left, right)
 
-            case TokenType.GREATER:
-                self.check_number_operands(binary.operator, left, right)
-                return left > right
+    def visit_string_binary(self, binary):
+        left = binary.left.visit(self)
+        right = binary.right.visit(self)
 
-            case TokenType.GREATER_EQUAL:
-                self.check_number_operands(binary.operator, left, right)
-                return left >= right
+        if type(left) is str and type(right) is str:
+            return left + right
 
-            case TokenType.LESS:
-                self.check_number_operands(binary.operator, left, right)
-                return left < right
+        return self.deoptimize_binary(binary, left, right)
 
-            case TokenType.LESS_EQUAL:
-                self.check_number_operands(binary.operator, left, right)
-                return left <= right
+    def deoptimize_binary(self, binary: Binary, left: typing.Any, right: typing.Any):
+        """rewrite `binary` back for good, its guard failed on these operands"""
 
-            case TokenType.BANG_EQUAL: return not self.is_equal(left, right)
-            case TokenType.EQUAL_EQUAL: return self.is_equal(left, right)
+        binary.__class__ = Binary
+        binary.generic = True
+        self.counters["deoptimized"] += 1
 
-        raise NotImplementedError("unreachable")
+        return binary.operation(binary.operator, left, right)
 
     def visit_variable_expression(self, variable):
         return self.look_up_variable(variable.name, variable)
 
-    def look_up_variable(self, name: Token, expression: Expression):
-        distance = self.locals.get(id(expression))
+    def look_up_variable(self, name: Token, expression: Variable | This):
+        distance = expression.depth
 
         if distance is not None:
-            # print(f"{name.lexeme} {id(expression)} found at distance {distance}")
-            return self.environment.get_at(distance, name.lexeme)
+            environment = self.environment
+            while distance:
+                environment = environment.enclosing
+                distance -= 1
+
+            return environment.values[expression.slot]
+
+        # a node may have been run by another interpreter before
+        cell = expression.cell
+        if cell is None or cell.environment is not self.globals:
+            cell = expression.cell = self.globals.cell(name.lexeme)
 
-        # print(f"{name.lexeme} {id(expression)} not found")
-        return self.globals.get(name)
+        value = cell.value
+        if value is UNDEFINED:
+            raise RuntimeError(name, f"Undefined variable '{name.lexeme}'.")
+
+        return value
 
     def visit_assign_expression(self, assign):
-        value = self.evaluate(assign.value)
+        return self.assign(assign, self.evaluate(assign.value))
 
-        distance = self.locals.get(id(assign))
-        if distance is not None:
-            self.environment.assign_at(distance, assign.name, value)
-        else:
-            self.globals.assign(assign.name, value)
+    def assign(self, assign: Assign, value: typing.Any):
+        if assign.depth is not None:
+            self.environment.assign_at(assign.depth, assign.slot, value)
+            return value
 
+        cell = assign.cell
+        if cell is None or cell.environment is not self.globals:
+            cell = assign.cell = self.globals.cell(assign.name.lexeme)
+
+        if cell.value is UNDEFINED:
+            raise RuntimeError(assign.name, f"Undefined variable '{assign.name.lexeme}'.")
+
+        cell.value = value
         return value
 
     def visit_logical(self, logical):
         left = self.evaluate(logical.left)
 
-        if logical.operator.type == TokenType.OR:
-            if self.is_truthy(left):
-                return left
-        else:
-            if not self.is_truthy(left):
-                return left
+        if (left is not None and left is not False) is logical.is_or:
+            return left
 
         return self.evaluate(logical.right)
 
     def visit_call(self, call):
-        callee = self.evaluate(call.callee)
+        if type(call.callee) is Get:
+            return self.invoke(call, call.callee)
+
+        return self.call(call, self.evaluate(call.callee))
+
+    def invoke(self, call: Call, get: Get):
+        """`object.method(...)` calls the method with `this` in its frame, without binding it first"""
+
+        instance = self.evaluate(get.object)
+
+        method = self.look_up_property(get, instance)
+        if method is None:
+            return self.call(call, instance.values[get.index])
 
         arguments = [
             self.evaluate(argument)
             for argument in call.arguments
         ]
 
-        if not isinstance(callee, Callable):
-            raise RuntimeError(call.parenthesis, "Can only call functions and classes.")
+        self.check_call(call, method, arguments)
+        return method.invoke(self, instance, arguments)
 
-        function = typing.cast(Callable, callee)
-        if len(arguments) != function.arity():
-            raise RuntimeError(call.parenthesis, f"Expected {function.arity()} arguments but got {len(arguments)}.")
+    def call(self, call: Call, callee: typing.Any):
+        arguments = [
+            self.evaluate(argument)
+            for argument in call.arguments
+        ]
 
+        self.check_call(call, callee, arguments)
         return callee.call(self, arguments)
 
+    def check_call(self, call: Call, callee: typing.Any, arguments: typing.List[typing.Any]):
+        if not isinstance(callee, Callable):
+            raise RuntimeError(call.parenthesis, "Can only call functions and classes.")
+
+        if len(arguments) != callee.arity:
+            raise RuntimeError(call.parenthesis, f"Expected {callee.arity} arguments but got {len(arguments)}.")
+
     def visit_get(self, get):
-        object = self.evaluate(get.object)
+        return self.get_property(get, self.evaluate(get.object))
+
+    def get_property(self, get: Get, object: typing.Any):
+        method = self.look_up_property(get, object)
+
+        if method is None:
+            if not get.generic:
+                get.__class__ = FieldGet
+                self.counters["specialized"] += 1
+
+            return object.values[get.index]
 
-        if isinstance(object, LoxInstance):
-            return object.get(get.name)
+        return method.bind(object)
 
-        raise RuntimeError(get.name, "Only instances have properties.")
+    def visit_field_get(self, get):
+        object = get.object.visit(self)
+
+        # monomorphic, for instances of the shape the inline cache was filled for
+        if type(object) is LoxInstance and object.shape is get.shape:
+            return object.values[get.index]
+
+        get.__class__ = Get
+        get.generic = True
+        self.counters["deoptimized"] += 1
+
+        return self.get_property(get, object)
+
+    def look_up_property(self, get: Get, object: typing.Any) -> typing.Optional[LoxFunction]:
+        """the method `get` names on `object`, or None when it is the field at `get.index`"""
+
+        if not isinstance(object, LoxInstance):
+            raise RuntimeError(get.name, "Only instances have properties.")
+
+        # the inline cache holds for every instance of the shape it was filled for
+        if object.shape is not get.shape:
+            get.index, get.method = object.look_up(get.name)
+            get.shape = object.shape
+
+        return get.method
 
     def visit_set(self, set):
         object = self.evaluate(set.object)
@@ -226,8 +370,19 @@ class Interpreter(ExpressionVisitor, StatementVisitor):
         if not isinstance(object, LoxInstance):
             raise RuntimeError(set.name, "Only instances have properties.")
 
-        value = self.evaluate(set.value)
-        object.set(set.name, value)
+        return self.store_property(set, object, self.evaluate(set.value))
+
+    def store_property(self, set: Set, object: LoxInstance, value: typing.Any):
+        # the inline cache holds for every instance of the shape it was filled for
+        if object.shape is not set.shape:
+            set.index, set.transition = object.shape.store(set.name.lexeme)
+            set.shape = object.shape
+
+        if set.transition is None:
+            object.values[set.index] = value
+        else:
+            object.shape = set.transition
+            object.values.append(value)
 
         return value
 
@@ -239,17 +394,16 @@ class Interpreter(ExpressionVisitor, StatementVisitor):
             if not isinstance(superclass, LoxClass):
                 raise RuntimeError(class_.superclass.name, "Superclass must be a class.")
 
-        self.environment.define(class_.name.lexeme, None)
+        self.define(class_.name, class_.slot, None)
 
         if class_.superclass is not None:
-            self.environment = self.environment.inner()
-            self.environment.define("super", superclass)
+            self.environment = Environment(self.environment, [superclass])
 
         methods = {}
         for method in class_.methods:
             is_initializer = "init" == method.name.lexeme
 
-            function = LoxFunction(method, self.environment, is_initializer)
+            function = self.create_function(method, self.environment, is_initializer)
             methods[method.name.lexeme] = function
 
         klass = LoxClass(class_.name.lexeme, superclass, methods)
@@ -257,19 +411,20 @@ class Interpreter(ExpressionVisitor, StatementVisitor):
         if class_.superclass is not None:
             self.environment = self.environment.enclosing
 
-        self.environment.assign(class_.name, klass)
+        self.define(class_.name, class_.slot, klass)
 
     def visit_this(self, this):
         return self.look_up_variable(this.keyword, this)
 
     def visit_super(self, super_):
-        distance = self.locals.get(id(super_))
+        distance = super_.depth
         assert distance is not None
 
-        superclass = self.environment.get_at(distance, "super")
+        # `super` is alone in its scope, around the frame of the method where `this` is first
+        superclass = self.environment.get_at(distance, 0)
         assert isinstance(superclass, LoxClass)
 
-        instance = self.environment.get_at(distance - 1, "this")
+        instance = self.environment.get_at(distance - 1, 0)
         assert isinstance(instance, LoxInstance)
 
         method = superclass.find_method(super_.method.lexeme)
@@ -287,27 +442,6 @@ class Interpreter(ExpressionVisitor, StatementVisitor):
 
         return True
 
-    def is_equal(self, a: typing.Any, b: typing.Any):
-        if a is None and b is None:
-            return True
-
-        if a is None:
-            return False
-
-        return a == b
-
-    def check_number_operand(self, operator: Token, operand: typing.Any):
-        if isinstance(operand, float):
-            return
-
-        raise RuntimeError(operator, "Operand must be a number.")
-
-    def check_number_operands(self, operator: Token, left: typing.Any, right: typing.Any):
-        if isinstance(left, float) and isinstance(right, float):
-            return
-
-        raise RuntimeError(operator, "Operand must be a number.")
-
     def stringify(self, value: typing.Any):
         if value is None:
             return "nil"
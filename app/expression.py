@@ -2,7 +2,13 @@ import abc
 import dataclasses
 import typing
 
-from .grammar import Token
+from .grammar import Token, TokenType
+from .operators import BINARY_OPERATIONS, NUMBER_OPERATIONS, UNARY_OPERATIONS, BinaryOperation, UnaryOperation
+
+if typing.TYPE_CHECKING:
+    from .class_ import Shape
+    from .function import LoxFunction
+    from .lox import GlobalCell
 
 
 class Expression(abc.ABC):
@@ -36,6 +42,12 @@ class Unary(Expression):
     operator: Token
     right: Expression
 
+    # bound once from the operator, instead of dispatching on every evaluation
+    operation: UnaryOperation = dataclasses.field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.operation = UNARY_OPERATIONS[self.operator.type]
+
     def visit(self, visitor: "ExpressionVisitor"):
         return visitor.visit_unary(self)
 
@@ -47,15 +59,49 @@ class Binary(Expression):
     operator: Token
     right: Expression
 
+    # bound once from the operator, instead of dispatching on every evaluation
+    operation: BinaryOperation = dataclasses.field(init=False, repr=False, compare=False)
+    number_operation: typing.Callable[[float, float], typing.Any] = dataclasses.field(init=False, repr=False, compare=False)
+
+    # set by the Interpreter once the node was rewritten back from a specialized variant
+    generic: bool = dataclasses.field(default=False, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.operation = BINARY_OPERATIONS[self.operator.type]
+        self.number_operation = NUMBER_OPERATIONS[self.operator.type]
+
     def visit(self, visitor: "ExpressionVisitor"):
         return visitor.visit_binary(self)
 
 
+@dataclasses.dataclass
+class NumberBinary(Binary):
+    """`Binary` the Interpreter rewrote after it saw two numbers"""
+
+    def visit(self, visitor: "ExpressionVisitor"):
+        return visitor.visit_number_binary(self)
+
+
+@dataclasses.dataclass
+class StringBinary(Binary):
+    """`+` the Interpreter rewrote after it saw two strings"""
+
+    def visit(self, visitor: "ExpressionVisitor"):
+        return visitor.visit_string_binary(self)
+
+
 @dataclasses.dataclass
 class Variable(Expression):
 
     name: Token
 
+    # set by the Resolver, `depth` is None for globals
+    depth: typing.Optional[int] = None
+    slot: int = 0
+
+    # cached by the Interpreter on first access to a global
+    cell: typing.Optional["GlobalCell"] = dataclasses.field(default=None, repr=False, compare=False)
+
     def visit(self, visitor: "ExpressionVisitor"):
         return visitor.visit_variable_expression(self)
 
@@ -66,6 +112,13 @@ class Assign(Expression):
     name: Token
     value: Expression
 
+    # set by the Resolver, `depth` is None for globals
+    depth: typing.Optional[int] = None
+    slot: int = 0
+
+    # cached by the Interpreter on first access to a global
+    cell: typing.Optional["GlobalCell"] = dataclasses.field(default=None, repr=False, compare=False)
+
     def visit(self, visitor: "ExpressionVisitor"):
         return visitor.visit_assign_expression(self)
 
@@ -77,6 +130,12 @@ class Logical(Expression):
     operator: Token
     right: Expression
 
+    # `or` returns a truthy left operand, `and` a falsey one
+    is_or: bool = dataclasses.field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.is_or = self.operator.type == TokenType.OR
+
     def visit(self, visitor: "ExpressionVisitor"):
         return visitor.visit_logical(self)
 
@@ -98,10 +157,27 @@ class Get(Expression):
     object: Expression
     name: Token
 
+    # inline cache filled by the Interpreter: where the property is for instances of `shape`,
+    # the index of a field or the method when `method` is set
+    shape: typing.Optional["Shape"] = dataclasses.field(default=None, repr=False, compare=False)
+    index: int = dataclasses.field(default=-1, repr=False, compare=False)
+    method: typing.Optional["LoxFunction"] = dataclasses.field(default=None, repr=False, compare=False)
+
+    # set by the Interpreter once the node was rewritten back from a specialized variant
+    generic: bool = dataclasses.field(default=False, repr=False, compare=False)
+
     def visit(self, visitor: "ExpressionVisitor"):
         return visitor.visit_get(self)
 
 
+@dataclasses.dataclass
+class FieldGet(Get):
+    """`Get` the Interpreter rewrote after it read a field, for instances of the cached shape"""
+
+    def visit(self, visitor: "ExpressionVisitor"):
+        return visitor.visit_field_get(self)
+
+
 @dataclasses.dataclass
 class Set(Expression):
 
@@ -109,6 +185,12 @@ class Set(Expression):
     name: Token
     value: Expression
 
+    # inline cache filled by the Interpreter: the index of the field for instances of `shape`,
+    # or the shape they move to when `transition` is set, adding it
+    shape: typing.Optional["Shape"] = dataclasses.field(default=None, repr=False, compare=False)
+    index: int = dataclasses.field(default=-1, repr=False, compare=False)
+    transition: typing.Optional["Shape"] = dataclasses.field(default=None, repr=False, compare=False)
+
     def visit(self, visitor: "ExpressionVisitor"):
         return visitor.visit_set(self)
 
@@ -118,6 +200,10 @@ class This(Expression):
 
     keyword: Token
 
+    # set by the Resolver, `depth` is None for globals
+    depth: typing.Optional[int] = None
+    slot: int = 0
+
     def visit(self, visitor: "ExpressionVisitor"):
         return visitor.visit_this(self)
 
@@ -128,6 +214,10 @@ class Super(Expression):
     keyword: Token
     method: Token
 
+    # set by the Resolver, `depth` is None for globals
+    depth: typing.Optional[int] = None
+    slot: int = 0
+
     def visit(self, visitor: "ExpressionVisitor"):
         return visitor.visit_super(self)
 
@@ -146,6 +236,12 @@ class ExpressionVisitor:
     def visit_binary(self, binary: Binary):
         pass
 
+    def visit_number_binary(self, binary: NumberBinary):
+        return self.visit_binary(binary)
+
+    def visit_string_binary(self, binary: StringBinary):
+        return self.visit_binary(binary)
+
     def visit_variable_expression(self, variable: Variable):
         pass
 
@@ -161,6 +257,9 @@ class ExpressionVisitor:
     def visit_get(self, get: Get):
         pass
 
+    def visit_field_get(self, get: FieldGet):
+        return self.visit_get(get)
+
     def visit_set(self, set: Set):
         pass
 
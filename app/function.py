@@ -1,8 +1,6 @@
-import abc
-import builtins
 import typing
 
-from .lox import Environment
+from .lox import Environment, GlobalEnvironment
 from .statement import FunctionStatement
 
 if typing.TYPE_CHECKING:
@@ -10,23 +8,32 @@ if typing.TYPE_CHECKING:
     from .evaluation import Interpreter
 
 
-class Callable(abc.ABC):
+class Callable:
+    """
+    Base of the values Lox can call.
 
-    @abc.abstractmethod
-    def arity(self) -> int:
-        pass
+    A plain class rather than an ABC, so that call sites check it with a fast `isinstance`,
+    and `arity` is an attribute set once rather than a method called on every call.
+    """
+
+    __slots__ = ("arity",)
+
+    arity: int
 
-    @abc.abstractmethod
     def call(
         self,
         interpreter: "Interpreter",
         arguments: typing.List[typing.Any]
     ) -> typing.Any:
-        pass
+        """`arguments` is a fresh list, which the callee may keep or modify"""
+
+        raise NotImplementedError
 
 
 class NativeFunction(Callable):
 
+    __slots__ = ("_name", "_callable")
+
     def __init__(
         self,
         name: str,
@@ -34,11 +41,8 @@ class NativeFunction(Callable):
         callable: typing.Callable
     ):
         self._name = name
-        self._arity = arity
         self._callable = callable
-
-    def arity(self) -> int:
-        return self._arity
+        self.arity = arity
 
     def call(self, interpreter, arguments):
         return self._callable(*arguments)
@@ -47,51 +51,118 @@ class NativeFunction(Callable):
         return f"<native fn {self._name}>"
 
 
-class Return(builtins.RuntimeError):
+class TailCall:
+    """
+    Completion of `return f(...)` in tail position, run by the returning function in place of its frame.
+    """
+
+    __slots__ = ("function", "receiver", "arguments")
+
+    def __init__(
+        self,
+        function: Callable,
+        receiver: typing.Optional["LoxInstance"],
+        arguments: typing.List[typing.Any],
+    ):
+        self.function = function
+        self.receiver = receiver
+        self.arguments = arguments
+
+    def call(self, interpreter: "Interpreter"):
+        if self.receiver is not None:
+            return typing.cast(LoxFunction, self.function).invoke(interpreter, self.receiver, self.arguments)
 
-    def __init__(self, value: typing.Any):
-        self.value = value
+        return self.function.call(interpreter, self.arguments)
 
 
 class LoxFunction(Callable):
 
+    __slots__ = ("_declaration", "_closure", "_is_initializer", "_receiver")
+
     def __init__(
         self,
         declaration: FunctionStatement,
-        closure: Environment,
+        closure: Environment | GlobalEnvironment,
         is_initializer: bool,
+        receiver: typing.Optional["LoxInstance"] = None,
     ):
         self._declaration = declaration
         self._closure = closure
         self._is_initializer = is_initializer
+        self._receiver = receiver
+        self.arity = len(declaration.parameters)
+
+    @property
+    def declaration(self) -> FunctionStatement:
+        return self._declaration
+
+    @property
+    def is_initializer(self) -> bool:
+        return self._is_initializer
 
-    def arity(self) -> int:
-        return len(self._declaration.parameters)
+    @property
+    def receiver(self) -> typing.Optional["LoxInstance"]:
+        return self._receiver
 
     def call(self, interpreter, arguments):
-        environment = self._closure.inner()
+        if self._receiver is not None:
+            return self.invoke(interpreter, self._receiver, arguments)
 
-        for parameter, argument in zip(self._declaration.parameters, arguments):
-            environment.define(parameter.lexeme, argument)
+        return self.execute(interpreter, self.frame(None, arguments))
 
-        try:
-            interpreter.execute_block(self._declaration.body, environment)
-        except Return as returned:
-            if self._is_initializer:
-                return self._closure.get_at(0, "this")
+    def invoke(self, interpreter, receiver: "LoxInstance", arguments: typing.List[typing.Any]):
+        """call as a method of `receiver`, without creating a bound method"""
 
-            return returned.value
+        value = self.execute(interpreter, self.frame(receiver, arguments))
 
         if self._is_initializer:
-            return self._closure.get_at(0, "this")
+            return receiver
+
+        return value
+
+    def frame(self, receiver: typing.Optional["LoxInstance"], arguments: typing.List[typing.Any]):
+        """
+        the environment of a call, made from `arguments` in place:
+        `this` first for methods, followed by the parameters and the slots of the body's locals
+        """
+
+        if receiver is not None:
+            arguments.insert(0, receiver)
+
+        locals = self._declaration.frame_size - len(arguments)
+        if locals:
+            arguments += [None] * locals
+
+        return Environment(self._closure, arguments)
+
+    def execute(self, interpreter, environment: Environment):
+        completion = self.run(interpreter, environment)
+
+        # the callee of a tail call replaces the frame of the function returning it
+        while type(completion) is TailCall:
+            function = completion.function
+
+            if not isinstance(function, LoxFunction) or function._is_initializer:
+                return completion.call(interpreter)
+
+            receiver = completion.receiver
+            if receiver is None:
+                receiver = function._receiver
+
+            completion = function.run(interpreter, function.frame(receiver, completion.arguments))
+
+        if completion is not None:
+            return completion[0]
 
         return None
 
-    def bind(self, instance: "LoxInstance"):
-        environment = Environment(self._closure)
-        environment.define("this", instance)
+    def run(self, interpreter, environment: Environment):
+        """run the body, giving its completion"""
+
+        return interpreter.execute_block(self._declaration.body, environment)
 
-        return LoxFunction(self._declaration, environment, self._is_initializer)
+    def bind(self, instance: "LoxInstance"):
+        return LoxFunction(self._declaration, self._closure, self._is_initializer, instance)
 
     def __str__(self):
         return f"<fn {self._declaration.name.lexeme}>"
@@ -1,3 +1,4 @@
+import array
 import dataclasses
 import enum
 import typing
@@ -58,9 +59,65 @@ class TokenType(enum.Enum):
     EOF = enum.auto()
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Token:
     type: TokenType
     lexeme: str
     literal: typing.Any
     line: int
+
+
+class TokenBuffer:
+    """
+    Struct-of-arrays token storage.
+
+    Only the type, the offsets of the lexeme within the source and the line are kept,
+    lexemes and literals are sliced back from the source when a token is accessed.
+    Names and string literals go through the scanner's symbol table.
+    """
+
+    types_by_value = {type.value: type for type in TokenType}
+
+    def __init__(self, source: str, symbols: typing.Dict[str, str]):
+        self.source = source
+        self.symbols = symbols
+
+        self.types = array.array("B")
+        self.starts = array.array("I")
+        self.ends = array.array("I")
+        self.lines = array.array("I")
+
+    def append(self, type: TokenType, start: int, end: int, line: int):
+        self.types.append(type.value)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lines.append(line)
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, index: int):
+        type = self.types_by_value[self.types[index]]
+        lexeme = self.source[self.starts[index]:self.ends[index]]
+
+        literal = None
+        if type == TokenType.NUMBER:
+            literal = float(lexeme)
+        elif type == TokenType.STRING:
+            literal = lexeme[1:-1]
+            literal = self.symbols.setdefault(literal, literal)
+        else:
+            lexeme = self.symbols.setdefault(lexeme, lexeme)
+
+        return Token(type, lexeme, literal, self.lines[index])
+
+    def __iter__(self):
+        for index in range(len(self.types)):
+            yield self[index]
+
+    @property
+    def nbytes(self):
+        return sum(
+            values.itemsize * len(values)
+            for values in (self.types, self.starts, self.ends, self.lines)
+        )
@@ -0,0 +1,649 @@
+import contextlib
+import dataclasses
+import math
+import sys
+import time
+import typing
+
+from .class_ import LoxClass, LoxInstance
+from .error import RuntimeError
+from .evaluation import Interpreter
+from .expression import Expression, ExpressionVisitor, Get, Literal, StringBinary
+from .function import LoxFunction, TailCall
+from .grammar import Token, TokenType
+from .lox import UNDEFINED, Environment, GlobalEnvironment
+from .resolver import creates_closures
+from .statement import FunctionStatement, StatementVisitor
+
+# a function is compiled once called this many times, or once its loops ran this many iterations
+CALL_THRESHOLD = 1000
+LOOP_THRESHOLD = 10000
+
+# signature of compiled bodies, giving the completion the tree-walker would
+Compiled = typing.Callable[["TieredInterpreter", Environment], typing.Any]
+
+
+class NotCompilable(Exception):
+    """
+    The function uses something the `FunctionCompiler` leaves to the tree-walker.
+    """
+
+
+def apply(
+    interpreter: Interpreter,
+    call: typing.Any,
+    callee: typing.Any,
+    receiver: typing.Optional[LoxInstance],
+    arguments: typing.List[typing.Any],
+):
+    interpreter.check_call(call, callee, arguments)
+
+    if receiver is not None:
+        return callee.invoke(interpreter, receiver, arguments)
+
+    return callee.call(interpreter, arguments)
+
+
+def tail_call(
+    interpreter: Interpreter,
+    call: typing.Any,
+    callee: typing.Any,
+    receiver: typing.Optional[LoxInstance],
+    arguments: typing.List[typing.Any],
+):
+    interpreter.check_call(call, callee, arguments)
+
+    return TailCall(callee, receiver, arguments)
+
+
+def undefined_variable(name: Token):
+    raise RuntimeError(name, f"Undefined variable '{name.lexeme}'.")
+
+
+def instance_error(name: Token):
+    raise RuntimeError(name, "Only instances have properties.")
+
+
+def super_method(method: Token, superclass: LoxClass, instance: LoxInstance):
+    function = superclass.find_method(method.lexeme)
+    if function is None:
+        raise RuntimeError(method, f"Undefined property '{method.lexeme}'.")
+
+    return function.bind(instance)
+
+
+@dataclasses.dataclass
+class Profile:
+    """What the `TieredInterpreter` counted of one function declaration, and the code compiled for it."""
+
+    function: FunctionStatement
+    calls: int = 0
+    iterations: int = 0
+    code: typing.Optional[Compiled] = None
+
+    # compiling is tried once, a function that is not compilable stays with the tree-walker
+    tried: bool = False
+
+
+class TieredFunction(LoxFunction):
+
+    __slots__ = ("_profile",)
+
+    def __init__(
+        self,
+        declaration: FunctionStatement,
+        closure: Environment | GlobalEnvironment,
+        is_initializer: bool,
+        profile: Profile,
+        receiver: typing.Optional[LoxInstance] = None,
+    ):
+        super().__init__(declaration, closure, is_initializer, receiver)
+
+        self._profile = profile
+
+    def run(self, interpreter, environment):
+        code = self._profile.code
+        if code is not None:
+            return code(interpreter, environment)
+
+        return interpreter.run_profiled(self._profile, environment)
+
+    def bind(self, instance: LoxInstance):
+        return TieredFunction(self._declaration, self._closure, self._is_initializer, self._profile, instance)
+
+
+# names the compiled functions are executed with, next to their constants
+RUNTIME = {
+    "TieredFunction": TieredFunction,
+    "LoxInstance": LoxInstance,
+    "UNDEFINED": UNDEFINED,
+    "apply": apply,
+    "tail_call": tail_call,
+    "undefined_variable": undefined_variable,
+    "instance_error": instance_error,
+    "super_method": super_method,
+}
+
+OPERATORS = {
+    TokenType.PLUS: "+",
+    TokenType.MINUS: "-",
+    TokenType.SLASH: "/",
+    TokenType.STAR: "*",
+    TokenType.GREATER: ">",
+    TokenType.GREATER_EQUAL: ">=",
+    TokenType.LESS: "<",
+    TokenType.LESS_EQUAL: "<=",
+}
+
+
+class FunctionCompiler(ExpressionVisitor, StatementVisitor):
+    """
+    Generates the Python function running the body of one Lox function, for the `TieredInterpreter`.
+
+    The slots of the call's frame become Python locals named `s<slot>`, which is only sound when
+    nothing can capture them: functions declaring functions or classes are not compilable. Slow
+    paths and errors go through the helpers of the interpreter, with the nodes and tokens they
+    need bound as constants `k<n>`, so that they behave and report exactly like the tree-walker.
+    """
+
+    def __init__(self, interpreter: "TieredInterpreter"):
+        self.interpreter = interpreter
+
+        self.lines: typing.List[str] = []
+        self.indent = 1
+        self.temporaries = 0
+
+        self.constants: typing.Dict[str, typing.Any] = {}
+        self.constant_names: typing.Dict[int, str] = {}
+
+        # enclosing frames read, as `v<depth>`
+        self.depth = 0
+
+    def compile(self, function: FunctionStatement) -> Compiled:
+        if creates_closures(function.body):
+            raise NotCompilable("it declares functions or classes")
+
+        for statement in function.body:
+            statement.visit(self)
+
+        name = f"lox_{function.name.lexeme}"
+        prelude = []
+
+        if function.frame_size:
+            slots = ", ".join(f"s{slot}" for slot in range(function.frame_size))
+            prelude.append(f"    {slots}, = environment.values")
+
+        for depth in range(1, self.depth + 1):
+            enclosing = "environment" if depth == 1 else f"e{depth - 1}"
+            prelude.append(f"    e{depth} = {enclosing}.enclosing")
+            prelude.append(f"    v{depth} = e{depth}.values")
+
+        source = "\n".join([f"def {name}(interpreter, environment):", *prelude, *self.lines, "    return None"]) + "\n"
+
+        namespace = {**RUNTIME, **self.constants}
+        exec(compile(source, f"<lox {function.name.lexeme}, line {function.name.line}>", "exec"), namespace)
+
+        return namespace[name]
+
+    def emit(self, code: str):
+        self.lines.append("    " * self.indent + code)
+
+    @contextlib.contextmanager
+    def indented(self):
+        start = len(self.lines)
+
+        self.indent += 1
+        yield
+        self.indent -= 1
+
+        if len(self.lines) == start:
+            self.lines.append("    " * (self.indent + 1) + "pass")
+
+    def temporary(self):
+        self.temporaries += 1
+        return f"t{self.temporaries}"
+
+    def constant(self, value: typing.Any):
+        name = self.constant_names.get(id(value))
+
+        if name is None:
+            name = self.constant_names[id(value)] = f"k{len(self.constants)}"
+            self.constants[name] = value
+
+        return name
+
+    def frame(self, depth: int):
+        self.depth = max(self.depth, depth)
+        return f"v{depth}"
+
+    def slot(self, depth: int, slot: int):
+        if depth == 0:
+            return f"s{slot}"
+
+        return f"{self.frame(depth)}[{slot}]"
+
+    def operands(self, expressions: typing.List[Expression]):
+        values = []
+        ends = []
+
+        for expression in expressions:
+            values.append(expression.visit(self))
+            ends.append(len(self.lines))
+
+        # a slot read early must be copied when code running after it could assign it
+        for index in range(len(values) - 2, -1, -1):
+            if values[index].startswith("s") and ends[index] != ends[-1]:
+                copy = self.temporary()
+                self.lines.insert(ends[index], "    " * self.indent + f"{copy} = {values[index]}")
+                values[index] = copy
+
+        return values
+
+    def number_check(self, expressions: typing.List[Expression], values: typing.List[str]):
+        checks = [
+            f"type({value}) is float"
+            for expression, value in zip(expressions, values)
+            if not (isinstance(expression, Literal) and type(expression.value) is float)
+        ]
+
+        return " and ".join(checks)
+
+    def named(self, value: str):
+        """`is` comparisons need a name, comparing literals with it is a warning"""
+
+        if value.isidentifier() and value not in ("None", "True", "False"):
+            return value
+
+        copy = self.temporary()
+        self.emit(f"{copy} = {value}")
+
+        return copy
+
+    def truthy(self, value: str):
+        value = self.named(value)
+        return f"{value} is not None and {value} is not False"
+
+    def falsey(self, value: str):
+        value = self.named(value)
+        return f"{value} is None or {value} is False"
+
+    def visit_expression(self, expression):
+        expression.expression.visit(self)
+
+    def visit_function(self, function):
+        raise NotCompilable("it declares functions or classes")
+
+    def visit_class(self, class_):
+        raise NotCompilable("it declares functions or classes")
+
+    def visit_if(self, if_):
+        condition = if_.condition.visit(self)
+
+        # the branch a type profile saw run most comes first
+        if if_.else_branch is not None and if_.taken is not None and if_.taken[1] > if_.taken[0]:
+            self.emit(f"if {self.falsey(condition)}:")
+
+            with self.indented():
+                if_.else_branch.visit(self)
+
+            self.emit("else:")
+
+            with self.indented():
+                if_.then_branch.visit(self)
+
+            return
+
+        self.emit(f"if {self.truthy(condition)}:")
+
+        with self.indented():
+            if_.then_branch.visit(self)
+
+        if if_.else_branch is not None:
+            self.emit("else:")
+
+            with self.indented():
+                if_.else_branch.visit(self)
+
+    def visit_print(self, print_):
+        value = print_.expression.visit(self)
+        self.emit(f"print(interpreter.stringify({value}))")
+
+    def visit_return(self, return_):
+        if return_.value is None:
+            self.emit("return (None,)")
+            return
+
+        if not (return_.tail_call and self.interpreter.tail_calls):
+            value = return_.value.visit(self)
+            self.emit(f"return ({value},)")
+            return
+
+        call = return_.value
+        callee, receiver, arguments = self.callee(call)
+
+        self.emit(f"return tail_call(interpreter, {self.constant(call)}, {callee}, {receiver}, [{', '.join(arguments)}])")
+
+    def visit_while(self, while_):
+        # the condition is flattened into lines too, which must run on every iteration
+        self.emit("while True:")
+
+        with self.indented():
+            condition = while_.condition.visit(self)
+            self.emit(f"if {self.falsey(condition)}:")
+            self.emit("    break")
+
+            while_.body.visit(self)
+
+    def visit_variable_statement(self, variable):
+        value = "None"
+        if variable.initializer is not None:
+            value = variable.initializer.visit(self)
+
+        self.emit(f"s{variable.slot} = {value}")
+
+    def visit_block(self, block):
+        if not block.inline:
+            raise NotCompilable("it has blocks with their own frame")
+
+        for statement in block.statements:
+            statement.visit(self)
+
+    def visit_literal(self, literal):
+        value = literal.value
+
+        if value is None or type(value) is bool or type(value) is str:
+            return repr(value)
+
+        if math.isfinite(value):
+            return repr(value)
+
+        return self.constant(value)
+
+    def visit_grouping(self, grouping):
+        return grouping.expression.visit(self)
+
+    def visit_unary(self, unary):
+        right = unary.right.visit(self)
+        result = self.temporary()
+
+        match unary.operator.type:
+            case TokenType.MINUS:
+                right = self.named(right)
+                operation = self.constant(unary.operation)
+                self.emit(f"{result} = -{right} if type({right}) is float else {operation}({self.constant(unary.operator)}, {right})")
+
+            case TokenType.BANG:
+                self.emit(f"{result} = {self.falsey(right)}")
+
+        return result
+
+    def visit_binary(self, binary):
+        expressions = [binary.left, binary.right]
+        left, right = self.operands(expressions)
+
+        result = self.temporary()
+        operator = self.constant(binary.operator)
+        operation = self.constant(binary.operation)
+
+        match binary.operator.type:
+            case TokenType.EQUAL_EQUAL:
+                left, right = self.named(left), self.named(right)
+                self.emit(f"{result} = ({right} is None) if {left} is None else ({left} == {right})")
+
+            case TokenType.BANG_EQUAL:
+                left, right = self.named(left), self.named(right)
+                self.emit(f"{result} = ({right} is not None) if {left} is None else not ({left} == {right})")
+
+            # the tree-walker saw strings here, so they are checked first
+            case TokenType.PLUS if type(binary) is StringBinary:
+                self.emit(f"{result} = {left} + {right} if type({left}) is str and type({right}) is str else {operation}({operator}, {left}, {right})")
+
+            case operator_type:
+                numbers = self.number_check(expressions, [left, right])
+                python_operator = OPERATORS[operator_type]
+
+                if numbers:
+                    self.emit(f"{result} = {left} {python_operator} {right} if {numbers} else {operation}({operator}, {left}, {right})")
+                else:
+                    self.emit(f"{result} = {left} {python_operator} {right}")
+
+        return result
+
+    def visit_variable_expression(self, variable):
+        return self.read(variable.name, variable.depth, variable.slot)
+
+    def read(self, name: Token, depth: typing.Optional[int], slot: int):
+        if depth == 0:
+            return f"s{slot}"
+
+        result = self.temporary()
+
+        if depth is not None:
+            self.emit(f"{result} = {self.slot(depth, slot)}")
+            return result
+
+        # the cell of a global stays the same, only its value changes
+        cell = self.constant(self.interpreter.globals.cell(name.lexeme))
+
+        self.emit(f"{result} = {cell}.value")
+        self.emit(f"if {result} is UNDEFINED:")
+        self.emit(f"    undefined_variable({self.constant(name)})")
+
+        return result
+
+    def visit_assign_expression(self, assign):
+        value = assign.value.visit(self)
+
+        if assign.depth is not None:
+            self.emit(f"{self.slot(assign.depth, assign.slot)} = {value}")
+            return value
+
+        cell = self.constant(self.interpreter.globals.cell(assign.name.lexeme))
+
+        self.emit(f"if {cell}.value is UNDEFINED:")
+        self.emit(f"    undefined_variable({self.constant(assign.name)})")
+        self.emit(f"{cell}.value = {value}")
+
+        return value
+
+    def visit_logical(self, logical):
+        left = logical.left.visit(self)
+
+        result = self.temporary()
+        self.emit(f"{result} = {left}")
+
+        if logical.is_or:
+            self.emit(f"if {self.falsey(result)}:")
+        else:
+            self.emit(f"if {self.truthy(result)}:")
+
+        with self.indented():
+            right = logical.right.visit(self)
+            self.emit(f"{result} = {right}")
+
+        return result
+
+    def callee(self, call: typing.Any):
+        """the callee, receiver and arguments of `call`, evaluated in the order of the tree-walker"""
+
+        if type(call.callee) is not Get:
+            callee, *arguments = self.operands([call.callee, *call.arguments])
+            return callee, "None", arguments
+
+        get = call.callee
+        instance = get.object.visit(self)
+
+        receiver = self.temporary()
+        callee = self.temporary()
+        node = self.constant(get)
+
+        # a field holding a function is called without receiver
+        self.emit(f"{receiver} = {instance}")
+        self.emit(f"{callee} = interpreter.look_up_property({node}, {receiver})")
+        self.emit(f"if {callee} is None:")
+        self.emit(f"    {callee} = {receiver}.values[{node}.index]")
+        self.emit(f"    {receiver} = None")
+
+        return callee, receiver, self.operands(call.arguments)
+
+    def visit_call(self, call):
+        callee, receiver, arguments = self.callee(call)
+
+        result = self.temporary()
+        node = self.constant(call)
+        values = ", ".join(arguments)
+
+        if receiver == "None":
+            self.emit(f"if type({callee}) is TieredFunction and {callee}.arity == {len(arguments)}:")
+            self.emit(f"    {result} = {callee}.call(interpreter, [{values}])")
+            self.emit("else:")
+            self.emit(f"    {result} = apply(interpreter, {node}, {callee}, None, [{values}])")
+        else:
+            self.emit(f"{result} = apply(interpreter, {node}, {callee}, {receiver}, [{values}])")
+
+        return result
+
+    def visit_get(self, get):
+        instance = self.named(get.object.visit(self))
+
+        result = self.temporary()
+        node = self.constant(get)
+
+        # the inline cache of the node, shared with the tree-walker
+        self.emit(f"if type({instance}) is LoxInstance and {instance}.shape is {node}.shape and {node}.method is None:")
+        self.emit(f"    {result} = {instance}.values[{node}.index]")
+        self.emit("else:")
+        self.emit(f"    {result} = interpreter.get_property({node}, {instance})")
+
+        return result
+
+    def visit_set(self, set):
+        instance = set.object.visit(self)
+
+        if instance.startswith("s"):
+            copy = self.temporary()
+            self.emit(f"{copy} = {instance}")
+            instance = copy
+
+        instance = self.named(instance)
+        node = self.constant(set)
+
+        self.emit(f"if type({instance}) is not LoxInstance:")
+        self.emit(f"    instance_error({self.constant(set.name)})")
+
+        value = set.value.visit(self)
+
+        self.emit(f"if {instance}.shape is {node}.shape and {node}.transition is None:")
+        self.emit(f"    {instance}.values[{node}.index] = {value}")
+        self.emit("else:")
+        self.emit(f"    interpreter.store_property({node}, {instance}, {value})")
+
+        return value
+
+    def visit_this(self, this):
+        return self.read(this.keyword, this.depth, this.slot)
+
+    def visit_super(self, super_):
+        assert super_.depth is not None
+
+        # `super` is alone in its scope, around the frame of the method where `this` is first
+        result = self.temporary()
+        superclass = self.slot(super_.depth, 0)
+        instance = self.slot(super_.depth - 1, 0)
+
+        self.emit(f"{result} = super_method({self.constant(super_.method)}, {superclass}, {instance})")
+
+        return result
+
+
+class TieredInterpreter(Interpreter):
+    """
+    Tree-walking engine compiling the functions that turn out hot to Python.
+
+    Functions are walked as by the `Interpreter` while their calls and loop iterations are
+    counted; past a threshold the `FunctionCompiler` generates a Python function for their
+    body, which later calls run instead. Calls already running keep walking the tree.
+    """
+
+    def __init__(self, call_threshold: int = CALL_THRESHOLD, loop_threshold: int = LOOP_THRESHOLD, log: bool = False):
+        super().__init__()
+
+        self.call_threshold = call_threshold
+        self.loop_threshold = loop_threshold
+        self.log = log
+
+        # by the identity of the declarations, dataclass nodes can't be hashed
+        self.profiles: typing.Dict[int, Profile] = {}
+
+        # of the function whose body is being walked
+        self.profile: typing.Optional[Profile] = None
+
+    def create_function(self, declaration, closure, is_initializer):
+        return TieredFunction(declaration, closure, is_initializer, self.profile_of(declaration))
+
+    def preload_calls(self, declaration, calls):
+        # a function hot in the recorded run is compiled on its first call
+        self.profile_of(declaration).calls += calls
+
+    def profile_of(self, declaration: FunctionStatement):
+        profile = self.profiles.get(id(declaration))
+        if profile is None:
+            profile = self.profiles[id(declaration)] = Profile(declaration)
+
+        return profile
+
+    def run_profiled(self, profile: Profile, environment: Environment):
+        """run the body of a function not compiled yet, compiling it first once it is hot"""
+
+        profile.calls += 1
+
+        if not profile.tried and (profile.calls >= self.call_threshold or profile.iterations >= self.loop_threshold):
+            self.compile(profile)
+
+            if profile.code is not None:
+                return profile.code(self, environment)
+
+        previous = self.profile
+        self.profile = profile
+
+        try:
+            return self.execute_block(profile.function.body, environment)
+        finally:
+            self.profile = previous
+
+    def compile(self, profile: Profile):
+        profile.tried = True
+        function = profile.function
+
+        start = time.perf_counter()
+        try:
+            profile.code = FunctionCompiler(self).compile(function)
+        except NotCompilable as reason:
+            self.report(f"not compiling {function.name.lexeme} (line {function.name.line}): {reason}")
+            return
+
+        elapsed = time.perf_counter() - start
+        self.counters["compiled"] += 1
+
+        self.report(
+            f"compiled {function.name.lexeme} (line {function.name.line}) after {profile.calls} calls"
+            f" and {profile.iterations} loop iterations in {elapsed * 1000:.2f}ms"
+        )
+
+    def report(self, message: str):
+        if self.log:
+            print(f"[jit] {message}", file=sys.stderr)
+
+    def visit_while(self, while_):
+        profile = self.profile
+        if profile is None:
+            return super().visit_while(while_)
+
+        while self.is_truthy(self.evaluate(while_.condition)):
+            profile.iterations += 1
+            completion = self.execute(while_.body)
+
+            if completion is not None:
+                return completion
+
+        return None
@@ -32,55 +32,87 @@ class Lox:
 
 
 class Environment:
+    """
+    Fixed-size frame of a local scope.
 
-    enclosing: typing.Optional["Environment"]
-    values: typing.Dict[str, typing.Any]
+    Variables are addressed by the depth and slot computed by the Resolver.
+    """
+
+    __slots__ = ("enclosing", "values")
+
+    enclosing: typing.Union["Environment", "GlobalEnvironment"]
+    values: typing.List[typing.Any]
 
     def __init__(
         self,
-        enclosing: typing.Optional["Environment"] = None,
-        initial: typing.Optional[typing.Dict[str, typing.Any]] = None
+        enclosing: typing.Union["Environment", "GlobalEnvironment"],
+        values: typing.List[typing.Any],
     ):
         self.enclosing = enclosing
-        self.values = initial or dict()
+        self.values = values
 
-    def inner(self):
-        return Environment(self)
+    def get_at(self, distance: int, slot: int):
+        return self.ancestor(distance).values[slot]
 
-    def define(self, name: str, value: typing.Any):
-        self.values[name] = value
+    def assign_at(self, distance: int, slot: int, value: typing.Any):
+        self.ancestor(distance).values[slot] = value
 
-    def assign(self, name: Token, value: typing.Any):
-        lexeme = name.lexeme
-        if lexeme in self.values:
-            self.values[lexeme] = value
-            return
+    def ancestor(self, distance: int):
+        environment = self
+
+        while distance:
+            environment = environment.enclosing
+            distance -= 1
 
-        if self.enclosing is not None:
-            return self.enclosing.assign(name, value)
+        return environment
 
-        raise RuntimeError(name, f"Undefined variable '{lexeme}'.")
 
-    def get(self, name: Token):
-        lexeme = name.lexeme
-        if lexeme in self.values:
-            return self.values[lexeme]
+UNDEFINED = object()
 
-        if self.enclosing is not None:
-            return self.enclosing.get(name)
 
-        raise RuntimeError(name, f"Undefined variable '{lexeme}'.")
+class GlobalCell:
+    """
+    Storage of a single global variable.
 
-    def get_at(self, distance: int, name: str):
-        return self.ancestor(distance).values.get(name)
+    Nodes referring to a global keep its cell so that the name is only looked up once.
+    """
 
-    def assign_at(self, distance: int, name: Token, value: typing.Any):
-        self.ancestor(distance).values[name.lexeme] = value
+    __slots__ = ("environment", "name", "value")
 
-    def ancestor(self, distance: int):
-        environment = self
+    def __init__(self, environment: "GlobalEnvironment", name: str):
+        self.environment = environment
+        self.name = name
+        self.value = UNDEFINED
 
-        for _ in range(distance):
-            environment = environment.enclosing
 
-        return environment
+class GlobalEnvironment:
+
+    cells: typing.Dict[str, GlobalCell]
+
+    def __init__(self):
+        self.cells = dict()
+
+    def cell(self, name: str):
+        cell = self.cells.get(name)
+
+        if cell is None:
+            cell = self.cells[name] = GlobalCell(self, name)
+
+        return cell
+
+    def define(self, name: str, value: typing.Any):
+        self.cell(name).value = value
+
+    def assign(self, name: Token, value: typing.Any):
+        cell = self.cell(name.lexeme)
+        if cell.value is UNDEFINED:
+            raise RuntimeError(name, f"Undefined variable '{name.lexeme}'.")
+
+        cell.value = value
+
+    def get(self, name: Token):
+        value = self.cell(name.lexeme).value
+        if value is UNDEFINED:
+            raise RuntimeError(name, f"Undefined variable '{name.lexeme}'.")
+
+        return value
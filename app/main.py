@@ -1,16 +1,84 @@
+import dataclasses
+import os
 import sys
+import typing
 
+from .bytecode import BytecodeCompiler, Disassembler
+from .cache import ProgramCache
+from .compilation import ClosureInterpreter
 from .evaluation import Interpreter
 from .expression import AstPrinter
-from .lox import Lox
-from .parser import Parser
+from .jit import CALL_THRESHOLD, LOOP_THRESHOLD, TieredInterpreter
+from .lox import GlobalEnvironment, Lox
+from .optimizer import DEFAULT_LEVEL, LEVELS, PassManager
+from .parser import Parser, PrattParser
+from .profile import ProfilingInterpreter, TypeProfile
 from .resolver import Resolver
-from .scanner import Scanner
+from .scanner import FastScanner, Scanner
+from .statement import Statement
+from .trampoline import STACK_SIZE, TrampolineInterpreter
+from .transpiler import TranspiledInterpreter
+from .vm import VirtualMachine
+
+SCANNERS = {
+    "fast": FastScanner,
+    "reference": Scanner,
+}
+
+PARSERS = {
+    "pratt": PrattParser,
+    "reference": Parser,
+}
+
+ENGINES = {
+    "tree": Interpreter,
+    "closure": ClosureInterpreter,
+    "vm": VirtualMachine,
+    "python": TranspiledInterpreter,
+    "trampoline": TrampolineInterpreter,
+    "tiered": TieredInterpreter,
+}
+
+
+@dataclasses.dataclass
+class Options:
+    scanner_type: typing.Type[Scanner] = FastScanner
+    parser_type: typing.Type[Parser] = PrattParser
+    engine_type: typing.Type[Interpreter] = Interpreter
+    stream: bool = False
+    cache: bool = True
+    cache_directory: typing.Optional[str] = None
+    stack_size: int = STACK_SIZE
+    tail_calls: bool = True
+    stats: bool = False
+    jit_calls: int = CALL_THRESHOLD
+    jit_loops: int = LOOP_THRESHOLD
+    jit_log: bool = False
+    profile_generate: typing.Optional[str] = None
+    profile_use: typing.Optional[str] = None
+    optimization: int = DEFAULT_LEVEL
+
+
+def create_interpreter(options: Options) -> Interpreter:
+    # recording a profile needs the instrumented tree-walker, whatever the engine
+    if options.profile_generate is not None:
+        interpreter = ProfilingInterpreter()
+    elif issubclass(options.engine_type, TrampolineInterpreter):
+        interpreter = options.engine_type(options.stack_size)
+    elif issubclass(options.engine_type, TieredInterpreter):
+        interpreter = options.engine_type(options.jit_calls, options.jit_loops, options.jit_log)
+    else:
+        interpreter = options.engine_type()
+
+    # engines without tail calls leave it unused
+    interpreter.tail_calls = options.tail_calls
+
+    return interpreter
 
 
-def tokenize(content: str):
-    scanner = Scanner(content)
-    tokens = scanner.scan_tokens()
+def tokenize(content: str, options: Options):
+    scanner = options.scanner_type(content)
+    tokens = scanner.scan_buffer()
 
     for token in tokens:
         literal = token.literal
@@ -20,61 +88,225 @@ def tokenize(content: str):
         print(f"{token.type.name} {token.lexeme} {literal}")
 
 
-def parse(content: str):
-    scanner = Scanner(content)
-    tokens = scanner.scan_tokens()
+def parse(content: str, options: Options):
+    scanner = options.scanner_type(content)
+    tokens = scanner.scan_buffer()
 
     if Lox.had_error:
         return
 
-    parser = Parser(tokens)
+    parser = options.parser_type(tokens)
     root = parser.parse_expression()
 
     if not Lox.had_error:
         print(AstPrinter().print(root))
 
 
-def evaluate(content: str):
-    scanner = Scanner(content)
-    tokens = scanner.scan_tokens()
+def evaluate(content: str, options: Options):
+    scanner = options.scanner_type(content)
+    tokens = scanner.scan_buffer()
 
     if Lox.had_error:
         return
 
-    parser = Parser(tokens)
+    parser = options.parser_type(tokens)
     expression = parser.parse_expression()
 
     if Lox.had_error:
         return
 
-    interpreter = Interpreter()
+    interpreter = create_interpreter(options)
     interpreter.interpret_expression(expression)
 
 
-def run(content: str):
-    scanner = Scanner(content)
-    tokens = scanner.scan_tokens()
+def optimize(statements: typing.List[Statement], options: Options, complete: bool = True):
+    return PassManager.for_level(options.optimization).run(statements, complete)
+
+
+def load_profile(content: str, options: Options):
+    if options.profile_use is None:
+        return None
+
+    # a profile of another version of the source or level is ignored, the nodes wouldn't match
+    return TypeProfile.load(options.profile_use, content, options.optimization)
+
+
+def run(content: str, options: Options, interpreter: Interpreter):
+    # the python engine caches its generated module instead of the statements
+    transpiling = isinstance(interpreter, TranspiledInterpreter)
+    profile = load_profile(content, options)
+
+    cache = None
+    if options.cache and options.cache_directory is not None:
+        cache = ProgramCache(options.cache_directory)
+
+        if transpiling:
+            module = cache.load_module(content, options.optimization)
+            if module is not None:
+                interpreter.interpret_module(module)
+                return
+        else:
+            # stored before the optimization passes, which depend on the options
+            program = cache.load(content)
+            if program is not None:
+                statements = optimize(program.statements, options)
+
+                if profile is not None:
+                    profile.apply(statements, interpreter)
+
+                interpreter.interpret(statements)
+                return
+
+    scanner = options.scanner_type(content)
+    tokens = scanner.scan_buffer()
 
     if Lox.had_error:
         return
 
-    parser = Parser(tokens)
+    parser = options.parser_type(tokens)
     statements = parser.parse()
 
     if Lox.had_error:
         return
 
-    interpreter = Interpreter()
-
-    resolver = Resolver(interpreter)
+    resolver = Resolver()
     resolver.resolve_statements(statements)
 
     if Lox.had_error:
         return
 
+    if cache is not None and not transpiling:
+        cache.store(content, statements)
+
+    statements = optimize(statements, options)
+
+    if transpiling:
+        module = interpreter.transpile(statements)
+
+        if cache is not None:
+            cache.store_module(content, module, options.optimization)
+
+        interpreter.interpret_module(module)
+        return
+
+    if profile is not None:
+        profile.apply(statements, interpreter)
+
     interpreter.interpret(statements)
 
 
+def run_streaming(content: str, options: Options, interpreter: Interpreter):
+    scanner = options.scanner_type(content)
+    parser = options.parser_type(scanner.iterate_tokens())
+
+    resolver = Resolver()
+    profile = load_profile(content, options)
+
+    for statement in parser.iterate_declarations():
+        if statement is None:
+            continue
+
+        # keep resolving after an error so that the exit code matches the batch mode
+        resolver.resolve_statements([statement])
+
+        # later statements may assign globals, only what is local to the statement is propagated
+        statements = optimize([statement], options, False)
+
+        # applied to every statement, their nodes are numbered in order
+        if profile is not None:
+            profile.apply(statements, interpreter)
+
+        if Lox.had_error or Lox.had_runtime_error:
+            continue
+
+        interpreter.interpret(statements)
+
+
+def disassemble(content: str, options: Options):
+    scanner = options.scanner_type(content)
+    tokens = scanner.scan_buffer()
+
+    if Lox.had_error:
+        return
+
+    parser = options.parser_type(tokens)
+    statements = parser.parse()
+
+    if Lox.had_error:
+        return
+
+    resolver = Resolver()
+    resolver.resolve_statements(statements)
+
+    if Lox.had_error:
+        return
+
+    compiler = BytecodeCompiler(GlobalEnvironment())
+    function = compiler.compile_script(optimize(statements, options))
+
+    print(Disassembler().disassemble(function))
+
+
+def parse_options(arguments: typing.List[str]):
+    options = Options()
+
+    for argument in arguments:
+        if argument.startswith("-O") and argument[2:].isdigit() and int(argument[2:]) in LEVELS:
+            options.optimization = int(argument[2:])
+            continue
+
+        if not argument.startswith("--"):
+            print(f"Unknown argument: {argument}", file=sys.stderr)
+            exit(1)
+
+        key, _, value = argument[2:].partition("=")
+
+        if key == "scanner" and value in SCANNERS:
+            options.scanner_type = SCANNERS[value]
+
+        elif key == "parser" and value in PARSERS:
+            options.parser_type = PARSERS[value]
+
+        elif key == "engine" and value in ENGINES:
+            options.engine_type = ENGINES[value]
+
+        elif key == "stream" and not value:
+            options.stream = True
+
+        elif key == "no-cache" and not value:
+            options.cache = False
+
+        elif key == "stats" and not value:
+            options.stats = True
+
+        elif key == "no-tail-calls" and not value:
+            options.tail_calls = False
+
+        elif key == "stack-size" and value.isdigit():
+            options.stack_size = int(value)
+
+        elif key == "jit-calls" and value.isdigit():
+            options.jit_calls = int(value)
+
+        elif key == "jit-loops" and value.isdigit():
+            options.jit_loops = int(value)
+
+        elif key == "jit-log" and not value:
+            options.jit_log = True
+
+        elif key == "profile-generate" and value:
+            options.profile_generate = value
+
+        elif key == "profile-use" and value:
+            options.profile_use = value
+
+        else:
+            print(f"Unknown option: {argument}", file=sys.stderr)
+            exit(1)
+
+    return options
+
+
 def main():
     if len(sys.argv) < 3:
         print("Usage: ./your_program.sh tokenize <filename>", file=sys.stderr)
@@ -82,21 +314,38 @@ def main():
 
     command = sys.argv[1]
     filename = sys.argv[2]
+    options = parse_options(sys.argv[3:])
+    options.cache_directory = os.path.join(os.path.dirname(os.path.abspath(filename)), "__loxcache__")
 
     with open(filename) as file:
         file_contents = file.read()
 
     if command == "tokenize":
-        tokenize(file_contents)
+        tokenize(file_contents, options)
 
     elif command == "parse":
-        parse(file_contents)
+        parse(file_contents, options)
 
     elif command == "evaluate":
-        evaluate(file_contents)
+        evaluate(file_contents, options)
 
     elif command == "run":
-        run(file_contents)
+        interpreter = create_interpreter(options)
+
+        if options.stream:
+            run_streaming(file_contents, options, interpreter)
+        else:
+            run(file_contents, options, interpreter)
+
+        if options.stats:
+            for name, count in interpreter.counters.items():
+                print(f"{name}: {count}", file=sys.stderr)
+
+        if isinstance(interpreter, ProfilingInterpreter) and not Lox.had_error:
+            interpreter.type_profile(file_contents, options.optimization).save(typing.cast(str, options.profile_generate))
+
+    elif command == "disassemble":
+        disassemble(file_contents, options)
 
     else:
         print(f"Unknown command: {command}", file=sys.stderr)
@@ -0,0 +1,126 @@
+import operator
+import typing
+
+from .error import RuntimeError
+from .grammar import Token, TokenType
+
+# handlers are bound to the nodes once, the interpreter calls them with the already evaluated operands
+BinaryOperation = typing.Callable[[Token, typing.Any, typing.Any], typing.Any]
+UnaryOperation = typing.Callable[[Token, typing.Any], typing.Any]
+
+
+def add(operator: Token, left: typing.Any, right: typing.Any):
+    if type(left) is float and type(right) is float:
+        return left + right
+
+    if type(left) is str and type(right) is str:
+        return left + right
+
+    raise RuntimeError(operator, "Operands must be two numbers or two strings.")
+
+
+def subtract(operator: Token, left: typing.Any, right: typing.Any):
+    if type(left) is float and type(right) is float:
+        return left - right
+
+    raise RuntimeError(operator, "Operand must be a number.")
+
+
+def multiply(operator: Token, left: typing.Any, right: typing.Any):
+    if type(left) is float and type(right) is float:
+        return left * right
+
+    raise RuntimeError(operator, "Operand must be a number.")
+
+
+def divide(operator: Token, left: typing.Any, right: typing.Any):
+    if type(left) is float and type(right) is float:
+        return left / right
+
+    raise RuntimeError(operator, "Operand must be a number.")
+
+
+def greater(operator: Token, left: typing.Any, right: typing.Any):
+    if type(left) is float and type(right) is float:
+        return left > right
+
+    raise RuntimeError(operator, "Operand must be a number.")
+
+
+def greater_equal(operator: Token, left: typing.Any, right: typing.Any):
+    if type(left) is float and type(right) is float:
+        return left >= right
+
+    raise RuntimeError(operator, "Operand must be a number.")
+
+
+def less(operator: Token, left: typing.Any, right: typing.Any):
+    if type(left) is float and type(right) is float:
+        return left < right
+
+    raise RuntimeError(operator, "Operand must be a number.")
+
+
+def less_equal(operator: Token, left: typing.Any, right: typing.Any):
+    if type(left) is float and type(right) is float:
+        return left <= right
+
+    raise RuntimeError(operator, "Operand must be a number.")
+
+
+def equal(operator: Token, left: typing.Any, right: typing.Any):
+    if left is None:
+        return right is None
+
+    return left == right
+
+
+def not_equal(operator: Token, left: typing.Any, right: typing.Any):
+    if left is None:
+        return right is not None
+
+    return not left == right
+
+
+def negate(operator: Token, right: typing.Any):
+    if type(right) is float:
+        return -right
+
+    raise RuntimeError(operator, "Operand must be a number.")
+
+
+def not_(operator: Token, right: typing.Any):
+    return right is None or right is False
+
+
+BINARY_OPERATIONS: typing.Dict[TokenType, BinaryOperation] = {
+    TokenType.PLUS: add,
+    TokenType.MINUS: subtract,
+    TokenType.STAR: multiply,
+    TokenType.SLASH: divide,
+    TokenType.GREATER: greater,
+    TokenType.GREATER_EQUAL: greater_equal,
+    TokenType.LESS: less,
+    TokenType.LESS_EQUAL: less_equal,
+    TokenType.EQUAL_EQUAL: equal,
+    TokenType.BANG_EQUAL: not_equal,
+}
+
+# the operators on two numbers, used once a node checked its operands itself
+NUMBER_OPERATIONS: typing.Dict[TokenType, typing.Callable[[float, float], typing.Any]] = {
+    TokenType.PLUS: operator.add,
+    TokenType.MINUS: operator.sub,
+    TokenType.STAR: operator.mul,
+    TokenType.SLASH: operator.truediv,
+    TokenType.GREATER: operator.gt,
+    TokenType.GREATER_EQUAL: operator.ge,
+    TokenType.LESS: operator.lt,
+    TokenType.LESS_EQUAL: operator.le,
+    TokenType.EQUAL_EQUAL: operator.eq,
+    TokenType.BANG_EQUAL: operator.ne,
+}
+
+UNARY_OPERATIONS: typing.Dict[TokenType, UnaryOperation] = {
+    TokenType.MINUS: negate,
+    TokenType.BANG: not_,
+}
@@ -0,0 +1,376 @@
+import dataclasses
+import typing
+
+from .error import RuntimeError
+from .expression import Expression, ExpressionVisitor, Literal
+from .statement import FunctionStatement, Statement, StatementVisitor
+
+# passes run at each optimization level, `-O<level>` on the command line
+LEVELS: typing.Dict[int, typing.List[typing.Type["Pass"]]] = {}
+DEFAULT_LEVEL = 1
+
+
+class Pass(ExpressionVisitor, StatementVisitor):
+    """
+    Rewrite of resolved statements, run between the `Resolver` and the engines.
+
+    Visiting a node gives the node to put in its place; by default the children are
+    rewritten and the node itself is kept. Passes may only replace expressions, the
+    declarations the resolution annotated must stay where they are.
+    """
+
+    def __init__(self):
+        # set when the last run rewrote anything, to run the passes again
+        self.changed = False
+
+    def run(self, statements: typing.List[Statement], complete: bool = True) -> typing.List[Statement]:
+        """`complete` is False when more statements of the program may follow, as in a stream"""
+
+        self.changed = False
+
+        return [statement.visit(self) for statement in statements]
+
+    def visit_expression(self, expression):
+        expression.expression = expression.expression.visit(self)
+        return expression
+
+    def visit_function(self, function):
+        function.body = [statement.visit(self) for statement in function.body]
+        return function
+
+    def visit_if(self, if_):
+        if_.condition = if_.condition.visit(self)
+        if_.then_branch = if_.then_branch.visit(self)
+
+        if if_.else_branch is not None:
+            if_.else_branch = if_.else_branch.visit(self)
+
+        return if_
+
+    def visit_print(self, print_):
+        print_.expression = print_.expression.visit(self)
+        return print_
+
+    def visit_return(self, return_):
+        if return_.value is not None:
+            return_.value = return_.value.visit(self)
+
+        return return_
+
+    def visit_while(self, while_):
+        while_.condition = while_.condition.visit(self)
+        while_.body = while_.body.visit(self)
+        return while_
+
+    def visit_variable_statement(self, variable):
+        if variable.initializer is not None:
+            variable.initializer = variable.initializer.visit(self)
+
+        return variable
+
+    def visit_block(self, block):
+        block.statements = [statement.visit(self) for statement in block.statements]
+        return block
+
+    def visit_class(self, class_):
+        # the superclass stays a variable, the engines report a bad one at its name
+        class_.methods = [method.visit(self) for method in class_.methods]
+        return class_
+
+    def visit_literal(self, literal):
+        return literal
+
+    def visit_grouping(self, grouping):
+        grouping.expression = grouping.expression.visit(self)
+        return grouping
+
+    def visit_unary(self, unary):
+        unary.right = unary.right.visit(self)
+        return unary
+
+    def visit_binary(self, binary):
+        binary.left = binary.left.visit(self)
+        binary.right = binary.right.visit(self)
+        return binary
+
+    def visit_variable_expression(self, variable):
+        return variable
+
+    def visit_assign_expression(self, assign):
+        assign.value = assign.value.visit(self)
+        return assign
+
+    def visit_logical(self, logical):
+        logical.left = logical.left.visit(self)
+        logical.right = logical.right.visit(self)
+        return logical
+
+    def visit_call(self, call):
+        call.callee = call.callee.visit(self)
+        call.arguments = [argument.visit(self) for argument in call.arguments]
+        return call
+
+    def visit_get(self, get):
+        get.object = get.object.visit(self)
+        return get
+
+    def visit_set(self, set):
+        set.object = set.object.visit(self)
+        set.value = set.value.visit(self)
+        return set
+
+    def visit_this(self, this):
+        return this
+
+    def visit_super(self, super_):
+        return super_
+
+
+class ConstantFolding(Pass):
+    """
+    Evaluates the operators whose operands are literals once, instead of on every run.
+
+    An operation that fails is left as it is, so that it still raises at its line when run.
+    """
+
+    def fold(self, expression: Expression, value: typing.Callable[[], typing.Any]) -> Expression:
+        try:
+            literal = Literal(value())
+        except (RuntimeError, ArithmeticError):
+            return expression
+
+        self.changed = True
+        return literal
+
+    def visit_grouping(self, grouping):
+        # parentheses only matter to the parser
+        self.changed = True
+        return grouping.expression.visit(self)
+
+    def visit_unary(self, unary):
+        right = unary.right = unary.right.visit(self)
+
+        if type(right) is Literal:
+            return self.fold(unary, lambda: unary.operation(unary.operator, right.value))
+
+        return unary
+
+    def visit_binary(self, binary):
+        left = binary.left = binary.left.visit(self)
+        right = binary.right = binary.right.visit(self)
+
+        if type(left) is Literal and type(right) is Literal:
+            return self.fold(binary, lambda: binary.operation(binary.operator, left.value, right.value))
+
+        return binary
+
+    def visit_logical(self, logical):
+        left = logical.left = logical.left.visit(self)
+        logical.right = logical.right.visit(self)
+
+        if type(left) is not Literal:
+            return logical
+
+        self.changed = True
+
+        # the right operand only runs when the left one doesn't decide
+        if (left.value is not None and left.value is not False) is logical.is_or:
+            return left
+
+        return logical.right
+
+
+@dataclasses.dataclass
+class Binding:
+    """A declaration of a variable, as far as the `ConstantPropagation` follows it."""
+
+    # the literal it is initialized with, None when it is anything else
+    value: typing.Optional[Literal]
+
+    definitions: int = 1
+    assigned: bool = False
+
+    # for globals, the top-level statement defining it first
+    statement: int = 0
+
+
+class ConstantPropagation(Pass):
+    """
+    Replaces the reads of variables initialized with a literal and never assigned by the literal.
+
+    Names are followed through the scopes the same way as the `Resolver` does. A global is
+    only replaced when the program defines it once, and its reads are in top-level statements
+    after that definition, since earlier ones would raise when they ran before it; without the
+    `complete` program, a later statement could still assign it and globals are left alone.
+    """
+
+    def __init__(self):
+        super().__init__()
+
+        self.complete = True
+        self.rewriting = False
+
+        self.scopes: typing.List[typing.Dict[str, Binding]] = []
+        self.statement = 0
+
+        # globals are followed by name, a function may use one declared after it
+        self.globals: typing.Dict[str, Binding] = {}
+        self.assigned_globals: typing.Set[str] = set()
+
+        # reads by the identity of their node, of a local binding or of a global name
+        self.reads: typing.Dict[int, Binding | str] = {}
+
+    def run(self, statements, complete=True):
+        self.changed = False
+        self.complete = complete
+
+        self.rewriting = False
+        self.walk(statements)
+
+        self.rewriting = True
+        return self.walk(statements)
+
+    def walk(self, statements: typing.List[Statement]):
+        rewritten = []
+
+        for self.statement, statement in enumerate(statements):
+            rewritten.append(statement.visit(self))
+
+        return rewritten
+
+    def declare(self, name: str, binding: Binding):
+        if self.rewriting:
+            return
+
+        if self.scopes:
+            self.scopes[-1][name] = binding
+            return
+
+        defined = self.globals.get(name)
+        if defined is None:
+            binding.statement = self.statement
+            self.globals[name] = binding
+        else:
+            defined.definitions += 1
+
+    def look_up(self, name: str) -> typing.Optional[Binding]:
+        for scope in reversed(self.scopes):
+            binding = scope.get(name)
+
+            if binding is not None:
+                return binding
+
+        return None
+
+    def constant(self, read: Binding | str) -> typing.Optional[Literal]:
+        if isinstance(read, Binding):
+            return None if read.assigned else read.value
+
+        if not self.complete or read in self.assigned_globals:
+            return None
+
+        binding = self.globals.get(read)
+        if binding is None or binding.definitions > 1 or self.statement <= binding.statement:
+            return None
+
+        return binding.value
+
+    def visit_variable_statement(self, variable):
+        variable = super().visit_variable_statement(variable)
+
+        value = variable.initializer if variable.initializer is not None else Literal(None)
+        self.declare(variable.name.lexeme, Binding(value if type(value) is Literal else None))
+
+        return variable
+
+    # functions, classes and parameters shadow names without being constants
+
+    def visit_function(self, function):
+        self.declare(function.name.lexeme, Binding(None))
+
+        return self.visit_body(function)
+
+    def visit_class(self, class_):
+        self.declare(class_.name.lexeme, Binding(None))
+
+        for method in class_.methods:
+            self.visit_body(method)
+
+        return class_
+
+    def visit_body(self, function: FunctionStatement):
+        self.scopes.append({parameter.lexeme: Binding(None) for parameter in function.parameters})
+        function.body = [statement.visit(self) for statement in function.body]
+        self.scopes.pop()
+
+        return function
+
+    def visit_block(self, block):
+        self.scopes.append({})
+        block = super().visit_block(block)
+        self.scopes.pop()
+
+        return block
+
+    def visit_variable_expression(self, variable):
+        if not self.rewriting:
+            self.reads[id(variable)] = self.look_up(variable.name.lexeme) or variable.name.lexeme
+            return variable
+
+        read = self.reads.get(id(variable))
+        value = self.constant(read) if read is not None else None
+
+        if value is None:
+            return variable
+
+        self.changed = True
+        return Literal(value.value)
+
+    def visit_assign_expression(self, assign):
+        assign = super().visit_assign_expression(assign)
+
+        if not self.rewriting:
+            binding = self.look_up(assign.name.lexeme)
+
+            if binding is not None:
+                binding.assigned = True
+            else:
+                self.assigned_globals.add(assign.name.lexeme)
+
+        return assign
+
+
+class PassManager:
+    """
+    Runs a pipeline of passes over resolved statements, again while one of them still
+    rewrites something, as propagating a constant may let another fold.
+    """
+
+    def __init__(self, passes: typing.List[typing.Type[Pass]], max_rounds: int = 4):
+        self.passes = passes
+        self.max_rounds = max_rounds
+
+    @staticmethod
+    def for_level(level: int):
+        return PassManager(LEVELS[level])
+
+    def run(self, statements: typing.List[Statement], complete: bool = True) -> typing.List[Statement]:
+        for _ in range(self.max_rounds):
+            changed = False
+
+            for pass_type in self.passes:
+                optimization = pass_type()
+                statements = optimization.run(statements, complete)
+                changed = changed or optimization.changed
+
+            if not changed:
+                break
+
+        return statements
+
+
+LEVELS.update({
+    0: [],
+    1: [ConstantFolding],
+    2: [ConstantFolding, ConstantPropagation],
+})
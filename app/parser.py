@@ -1,3 +1,4 @@
+import enum
 import typing
 
 from .expression import *
@@ -14,22 +15,24 @@ class Parser:
 
     def __init__(
         self,
-        tokens: typing.List[Token]
+        tokens: typing.Iterable[Token]
     ):
-        self.tokens = tokens
-        self.current = 0
+        self.tokens = iter(tokens)
+
+        # only a one token window is kept, so the tokens can be produced lazily
+        self.current: Token = next(self.tokens)
+        self.last: typing.Optional[Token] = None
 
     def parse(self):
         try:
-            statements: typing.List[Statement] = []
-
-            while not self.is_at_end:
-                statements.append(self.declaration())
-
-            return statements
+            return list(self.iterate_declarations())
         except ParserError:
             return None
 
+    def iterate_declarations(self):
+        while not self.is_at_end:
+            yield self.declaration()
+
     def parse_expression(self):
         try:
             return self.expression()
@@ -400,19 +403,20 @@ class Parser:
 
     def advance(self):
         if not self.is_at_end:
-            self.current += 1
+            self.last = self.current
+            self.current = next(self.tokens)
 
-        return self.previous()
+        return self.last
 
     @property
     def is_at_end(self):
         return self.peek().type == TokenType.EOF
 
     def peek(self):
-        return self.tokens[self.current]
+        return self.current
 
     def previous(self):
-        return self.tokens[self.current - 1]
+        return self.last
 
     def consume(self, type: TokenType, message: str):
         if self.check(type):
@@ -443,3 +447,143 @@ class Parser:
                 case TokenType.RETURN: return
 
             self.advance()
+
+
+class Precedence(enum.IntEnum):
+    NONE = 0
+    ASSIGNMENT = enum.auto()
+    OR = enum.auto()
+    AND = enum.auto()
+    EQUALITY = enum.auto()
+    COMPARISON = enum.auto()
+    TERM = enum.auto()
+    FACTOR = enum.auto()
+    UNARY = enum.auto()
+    CALL = enum.auto()
+
+
+class PrattParser(Parser):
+    """
+    Parser using a precedence table for expressions instead of one method per level.
+
+    Produces the same nodes and reports the same errors as the recursive descent.
+    """
+
+    def expression(self):
+        return self.parse_precedence(Precedence.ASSIGNMENT)
+
+    def parse_precedence(self, precedence: Precedence):
+        token = self.current
+
+        prefix = self.prefixes.get(token.type)
+        if prefix is None:
+            raise self.error(token, "Expect expression.")
+
+        self.advance()
+        expression = prefix(self, token)
+
+        infixes = self.infixes
+        while True:
+            token = self.current
+
+            infix = infixes.get(token.type)
+            if infix is None or infix[0] < precedence:
+                return expression
+
+            self.advance()
+            expression = infix[1](self, expression, token)
+
+    def literal(self, token: Token):
+        match token.type:
+            case TokenType.FALSE: return Literal(False)
+            case TokenType.TRUE: return Literal(True)
+            case TokenType.NIL: return Literal(None)
+
+        return Literal(token.literal)
+
+    def variable(self, token: Token):
+        return Variable(token)
+
+    def this(self, token: Token):
+        return This(token)
+
+    def super_(self, token: Token):
+        self.consume(TokenType.DOT, "Expect '.' after 'super'.")
+
+        method = self.consume(TokenType.IDENTIFIER, "Expect superclass method name.")
+
+        return Super(token, method)
+
+    def grouping(self, token: Token):
+        expression = self.expression()
+
+        self.consume(TokenType.RIGHT_PAREN, "Expect ')' after expression.")
+
+        return Grouping(expression)
+
+    def unary_operator(self, operator: Token):
+        right = self.parse_precedence(Precedence.UNARY)
+
+        return Unary(operator, right)
+
+    def binary_operator(self, left: Expression, operator: Token):
+        precedence = self.infixes[operator.type][0]
+        right = self.parse_precedence(precedence + 1)
+
+        return Binary(left, operator, right)
+
+    def logical_operator(self, left: Expression, operator: Token):
+        precedence = self.infixes[operator.type][0]
+        right = self.parse_precedence(precedence + 1)
+
+        return Logical(left, operator, right)
+
+    def assignment_operator(self, target: Expression, equals: Token):
+        value = self.parse_precedence(Precedence.ASSIGNMENT)
+
+        if isinstance(target, Variable):
+            return Assign(target.name, value)
+        elif isinstance(target, Get):
+            return Set(target.object, target.name, value)
+
+        raise self.error(equals, "Invalid assignment target.")
+
+    def call_operator(self, callee: Expression, parenthesis: Token):
+        return self.finish_call(callee)
+
+    def get_operator(self, object: Expression, dot: Token):
+        name = self.consume(TokenType.IDENTIFIER, "Expect property name after '.'.")
+
+        return Get(object, name)
+
+    prefixes: typing.Dict[TokenType, typing.Callable] = {
+        TokenType.FALSE: literal,
+        TokenType.TRUE: literal,
+        TokenType.NIL: literal,
+        TokenType.NUMBER: literal,
+        TokenType.STRING: literal,
+        TokenType.IDENTIFIER: variable,
+        TokenType.THIS: this,
+        TokenType.SUPER: super_,
+        TokenType.LEFT_PAREN: grouping,
+        TokenType.BANG: unary_operator,
+        TokenType.MINUS: unary_operator,
+    }
+
+    infixes: typing.Dict[TokenType, typing.Tuple[Precedence, typing.Callable]] = {
+        TokenType.EQUAL: (Precedence.ASSIGNMENT, assignment_operator),
+        TokenType.OR: (Precedence.OR, logical_operator),
+        TokenType.AND: (Precedence.AND, logical_operator),
+        TokenType.BANG_EQUAL: (Precedence.EQUALITY, binary_operator),
+        TokenType.EQUAL_EQUAL: (Precedence.EQUALITY, binary_operator),
+        TokenType.GREATER: (Precedence.COMPARISON, binary_operator),
+        TokenType.GREATER_EQUAL: (Precedence.COMPARISON, binary_operator),
+        TokenType.LESS: (Precedence.COMPARISON, binary_operator),
+        TokenType.LESS_EQUAL: (Precedence.COMPARISON, binary_operator),
+        TokenType.MINUS: (Precedence.TERM, binary_operator),
+        TokenType.PLUS: (Precedence.TERM, binary_operator),
+        TokenType.SLASH: (Precedence.FACTOR, binary_operator),
+        TokenType.STAR: (Precedence.FACTOR, binary_operator),
+        TokenType.LEFT_PAREN: (Precedence.CALL, call_operator),
+        TokenType.DOT: (Precedence.CALL, get_operator),
+    }
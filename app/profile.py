@@ -0,0 +1,241 @@
+import collections
+import dataclasses
+import hashlib
+import json
+import os
+import typing
+
+from .class_ import LoxClass, LoxInstance
+from .evaluation import Interpreter
+from .expression import Binary, Call, Expression, Get, NumberBinary, StringBinary
+from .function import LoxFunction
+from .statement import FunctionStatement, IfStatement, Statement
+
+PROFILE_VERSION = 1
+
+Node = Expression | Statement
+
+
+def walk(statements: typing.List[Statement]) -> typing.Iterator[Node]:
+    """the nodes of `statements` in pre-order, whose position in it numbers them in a profile"""
+
+    stack: typing.List[Node] = list(reversed(statements))
+
+    while stack:
+        node = stack.pop()
+        yield node
+
+        children = []
+        for field in dataclasses.fields(node):
+            value = getattr(node, field.name)
+
+            if isinstance(value, (Expression, Statement)):
+                children.append(value)
+            elif isinstance(value, list):
+                children.extend(item for item in value if isinstance(item, (Expression, Statement)))
+
+        stack.extend(reversed(children))
+
+
+def source_hash(source: str):
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+@dataclasses.dataclass
+class TypeProfile:
+    """
+    What the nodes of one program saw while it ran, by their number in `walk`.
+
+    `operands` holds the variant Binary nodes ended up as, `receivers` the classes of the
+    instances at Get nodes, `targets` how many times each Call node called each function
+    declaration, and `branches` how many times If statements ran their then and else branches.
+
+    Nodes are numbered across all the statements applied so far, so that a program run one
+    declaration at a time gets the same numbers as when run at once. Binary nodes start out
+    as the variant they ended up as, and the calls of each declaration count towards
+    compiling it in engines compiling hot functions.
+    """
+
+    source: str
+    optimization: int = 0
+    operands: typing.Dict[int, str] = dataclasses.field(default_factory=dict)
+    receivers: typing.Dict[int, typing.List[str]] = dataclasses.field(default_factory=dict)
+    targets: typing.Dict[int, typing.Dict[int, int]] = dataclasses.field(default_factory=dict)
+    branches: typing.Dict[int, typing.Tuple[int, int]] = dataclasses.field(default_factory=dict)
+
+    # number of the next node applied
+    cursor: int = dataclasses.field(default=0, repr=False, compare=False)
+
+    # calls of each declaration from anywhere in the program, it may be applied before its callers
+    calls: typing.Counter[int] = dataclasses.field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.calls = collections.Counter()
+
+        for targets in self.targets.values():
+            self.calls.update(targets)
+
+    @staticmethod
+    def load(path: str, source: str, optimization: int = 0) -> typing.Optional["TypeProfile"]:
+        """the profile stored at `path`, None when missing, unreadable or recorded for another program"""
+
+        try:
+            with open(path) as file:
+                data = json.load(file)
+
+            # the optimization passes rewrite the nodes, numbering them differently
+            if data["version"] != PROFILE_VERSION or data["source"] != source_hash(source) or data["optimization"] != optimization:
+                return None
+
+            return TypeProfile(
+                data["source"],
+                optimization,
+                {int(index): str(kind) for index, kind in data["operands"].items()},
+                {int(index): [str(name) for name in names] for index, names in data["receivers"].items()},
+                {
+                    int(index): {int(target): int(count) for target, count in targets.items()}
+                    for index, targets in data["targets"].items()
+                },
+                {int(index): (int(then), int(else_)) for index, (then, else_) in data["branches"].items()},
+            )
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+
+    def save(self, path: str):
+        data = {
+            "version": PROFILE_VERSION,
+            "source": self.source,
+            "optimization": self.optimization,
+            "operands": self.operands,
+            "receivers": self.receivers,
+            "targets": self.targets,
+            "branches": self.branches,
+        }
+
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+
+        try:
+            with open(temporary_path, "w") as file:
+                json.dump(data, file)
+
+            os.replace(temporary_path, path)
+        except OSError:
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+
+    def apply(self, statements: typing.List[Statement], interpreter: Interpreter):
+        """specialize the nodes of `statements` ahead of running them, as far as the profile saw them"""
+
+        for node in walk(statements):
+            index = self.cursor
+            self.cursor += 1
+
+            match node:
+                case Binary(generic=False) if index in self.operands:
+                    self.specialize_binary(node, self.operands[index], interpreter)
+
+                # sites seeing several classes can't keep to one shape
+                case Get() if len(self.receivers.get(index, ())) > 1:
+                    node.generic = True
+                    interpreter.counters["preloaded"] += 1
+
+                case FunctionStatement() if index in self.calls:
+                    interpreter.preload_calls(node, self.calls[index])
+
+                case IfStatement() if index in self.branches:
+                    node.taken = self.branches[index]
+
+    def specialize_binary(self, binary: Binary, kind: str, interpreter: Interpreter):
+        match kind:
+            case "number":
+                binary.__class__ = NumberBinary
+            case "string":
+                binary.__class__ = StringBinary
+            case "generic":
+                binary.generic = True
+            case _:
+                return
+
+        interpreter.counters["preloaded"] += 1
+
+
+class ProfilingInterpreter(Interpreter):
+    """
+    Tree-walking engine recording the `TypeProfile` of the program it runs.
+    """
+
+    def __init__(self):
+        super().__init__()
+
+        # statements run so far, their nodes are recorded by identity until numbered in the profile
+        self.program: typing.List[Statement] = []
+
+        self.receivers: typing.DefaultDict[int, typing.Set[str]] = collections.defaultdict(set)
+        self.targets: typing.DefaultDict[int, typing.Counter[int]] = collections.defaultdict(collections.Counter)
+        self.branches: typing.DefaultDict[int, typing.List[int]] = collections.defaultdict(lambda: [0, 0])
+
+    def interpret(self, statements):
+        self.program.extend(statements)
+        super().interpret(statements)
+
+    def type_profile(self, source: str, optimization: int = 0) -> TypeProfile:
+        profile = TypeProfile(source_hash(source), optimization)
+
+        nodes = list(walk(self.program))
+        numbers = {id(node): index for index, node in enumerate(nodes)}
+
+        for index, node in enumerate(nodes):
+            key = id(node)
+
+            match node:
+                case Binary():
+                    if node.generic:
+                        profile.operands[index] = "generic"
+                    elif type(node) is NumberBinary:
+                        profile.operands[index] = "number"
+                    elif type(node) is StringBinary:
+                        profile.operands[index] = "string"
+
+                case Get() if key in self.receivers:
+                    profile.receivers[index] = sorted(self.receivers[key])
+
+                case Call() if key in self.targets:
+                    profile.targets[index] = {
+                        numbers[target]: count
+                        for target, count in self.targets[key].items()
+                        if target in numbers
+                    }
+
+                case IfStatement() if key in self.branches:
+                    then, else_ = self.branches[key]
+                    profile.branches[index] = (then, else_)
+
+        return profile
+
+    def visit_if(self, if_):
+        taken = self.is_truthy(self.evaluate(if_.condition))
+        self.branches[id(if_)][0 if taken else 1] += 1
+
+        if taken:
+            return self.execute(if_.then_branch)
+
+        if if_.else_branch is not None:
+            return self.execute(if_.else_branch)
+
+        return None
+
+    def look_up_property(self, get, object):
+        if isinstance(object, LoxInstance):
+            self.receivers[id(get)].add(object.klass.name)
+
+        return super().look_up_property(get, object)
+
+    def check_call(self, call, callee, arguments):
+        function = callee.initializer if isinstance(callee, LoxClass) else callee
+
+        if isinstance(function, LoxFunction):
+            self.targets[id(call)][id(function.declaration)] += 1
+
+        super().check_call(call, callee, arguments)
@@ -1,11 +1,19 @@
+import dataclasses
 import enum
 import typing
 
-from .evaluation import Interpreter
-from .expression import Expression, ExpressionVisitor
+from .expression import Assign, Call, Expression, ExpressionVisitor, Super, This, Variable
 from .grammar import Token
 from .lox import Lox
-from .statement import FunctionStatement, Statement, StatementVisitor
+from .statement import (
+    BlockStatement,
+    ClassStatement,
+    FunctionStatement,
+    IfStatement,
+    Statement,
+    StatementVisitor,
+    WhileStatement,
+)
 
 
 class FunctionType(enum.Enum):
@@ -21,13 +29,53 @@ class ClassType(enum.Enum):
     SUBCLASS = enum.auto()
 
 
-class Resolver(ExpressionVisitor, StatementVisitor):
+@dataclasses.dataclass
+class Local:
+    slot: int
+    defined: bool = False
+
+
+@dataclasses.dataclass
+class Scope:
+    locals: typing.Dict[str, Local] = dataclasses.field(default_factory=dict)
+
+    # an inline scope has no frame of its own, its variables take the next free slots of the enclosing one
+    inline: bool = False
+
+    # for scopes with a frame, its free slot and size so far
+    next_slot: int = 0
+    frame_size: int = 0
+
+
+def creates_closures(statements: typing.List[Statement]) -> bool:
+    """whether functions or classes are declared in `statements`, the only way to capture their variables"""
+
+    for statement in statements:
+        match statement:
+            case FunctionStatement() | ClassStatement():
+                return True
+
+            case BlockStatement(statements=inner) if creates_closures(inner):
+                return True
+
+            case IfStatement(then_branch=then_branch, else_branch=else_branch):
+                if creates_closures([then_branch]):
+                    return True
 
-    scopes: typing.List[typing.Dict[str, bool]]
+                if else_branch is not None and creates_closures([else_branch]):
+                    return True
 
-    def __init__(self, interpreter: Interpreter):
-        self.interpreter = interpreter
+            case WhileStatement(body=body) if creates_closures([body]):
+                return True
 
+    return False
+
+
+class Resolver(ExpressionVisitor, StatementVisitor):
+
+    scopes: typing.List[Scope]
+
+    def __init__(self):
         self.scopes = []
 
         self.current_function = FunctionType.NONE
@@ -40,62 +88,108 @@ class Resolver(ExpressionVisitor, StatementVisitor):
         for statement in statements:
             self._resolve(statement)
 
-    def _resolve_local(self, expression: Expression, name: Token):
-        for index in range(len(self.scopes) - 1, -1, -1):
-            if name.lexeme in self.scopes[index]:
-                # print(f"resolve {name.lexeme} ({id(expression)}) at distance {len(self.scopes) - 1 - index}");
-                self.interpreter.resolve(expression, len(self.scopes) - 1 - index)
+    def _resolve_local(self, expression: Variable | Assign | This | Super, name: Token):
+        depth = 0
+
+        for scope in reversed(self.scopes):
+            local = scope.locals.get(name.lexeme)
+
+            if local is not None:
+                expression.depth = depth
+                expression.slot = local.slot
                 return
 
+            # inline scopes share the environment of the enclosing one
+            if not scope.inline:
+                depth += 1
+
     def _resolve_function(self, function: FunctionStatement, type: FunctionType):
         enclosing_function = self.current_function
         self.current_function = type
 
         self._begin_scope()
 
+        # the receiver takes the first slot of the frame of methods
+        if type in (FunctionType.METHOD, FunctionType.INITIALIZER):
+            self._add_local("this")
+
         for parameter in function.parameters:
             self._declare(parameter)
             self._define(parameter)
 
         self.resolve_statements(function.body)
 
-        self._end_scope()
+        function.frame_size = self._end_scope().frame_size
 
         self.current_function = enclosing_function
 
-    def _begin_scope(self):
-        self.scopes.append({})
+    def _begin_scope(self, inline: bool = False):
+        scope = Scope(inline=inline)
+
+        if inline:
+            scope.next_slot = self._frame().next_slot
+
+        self.scopes.append(scope)
 
     def _end_scope(self):
-        self.scopes.pop()
+        scope = self.scopes.pop()
+
+        # the slots of an inline scope are free again for the following ones
+        if scope.inline:
+            self._frame().next_slot = scope.next_slot
+
+        return scope
 
     def _peek_scope(self):
         return self.scopes[-1]
 
+    def _frame(self) -> Scope:
+        """the innermost scope with a frame of its own"""
+
+        return next(scope for scope in reversed(self.scopes) if not scope.inline)
+
+    def _add_local(self, name: str, defined: bool = True) -> int:
+        frame = self._frame()
+
+        slot = frame.next_slot
+        frame.next_slot += 1
+        frame.frame_size = max(frame.frame_size, frame.next_slot)
+
+        self._peek_scope().locals[name] = Local(slot, defined)
+        return slot
+
     def _declare(self, name: Token):
         if not len(self.scopes):
-            return
+            return None
 
         scope = self._peek_scope()
-        if name.lexeme in scope:
+
+        local = scope.locals.get(name.lexeme)
+        if local is not None:
             Lox.error_token(name, "Already a variable with this name in this scope.")
 
-        scope[name.lexeme] = False
+            local.defined = False
+            return local.slot
+
+        return self._add_local(name.lexeme, False)
 
     def _define(self, name: Token):
         if not len(self.scopes):
             return
 
         scope = self._peek_scope()
-        scope[name.lexeme] = True
+        scope.locals[name.lexeme].defined = True
 
     def visit_block(self, block):
-        self._begin_scope()
+        # without closures nothing can outlive the block, its variables can go in the enclosing frame
+        block.inline = len(self.scopes) > 0 and not creates_closures(block.statements)
+
+        self._begin_scope(block.inline)
         self.resolve_statements(block.statements)
-        self._end_scope()
+        block.frame_size = self._end_scope().frame_size
 
     def visit_variable_statement(self, variable):
-        self._declare(variable.name)
+        variable.slot = self._declare(variable.name)
 
         initializer = variable.initializer
         if initializer:
@@ -104,8 +198,11 @@ class Resolver(ExpressionVisitor, StatementVisitor):
         self._define(variable.name)
 
     def visit_variable_expression(self, variable):
-        if len(self.scopes) and self._peek_scope().get(variable.name.lexeme) == False:
-            Lox.error_token(variable.name, "Can't read local variable in its own initializer.")
+        if len(self.scopes):
+            local = self._peek_scope().locals.get(variable.name.lexeme)
+
+            if local is not None and not local.defined:
+                Lox.error_token(variable.name, "Can't read local variable in its own initializer.")
 
         self._resolve_local(variable, variable.name)
 
@@ -114,7 +211,7 @@ class Resolver(ExpressionVisitor, StatementVisitor):
         self._resolve_local(assign, assign.name)
 
     def visit_function(self, function):
-        self._declare(function.name)
+        function.slot = self._declare(function.name)
         self._define(function.name)
 
         self._resolve_function(function, FunctionType.FUNCTION)
@@ -140,6 +237,9 @@ class Resolver(ExpressionVisitor, StatementVisitor):
             if self.current_function == FunctionType.INITIALIZER:
                 Lox.error_token(return_.keyword, "Can't return a value from an initializer.")
 
+            # initializers return `this` whatever their body does
+            return_.tail_call = type(return_.value) is Call and self.current_function != FunctionType.INITIALIZER
+
             self._resolve(return_.value)
 
     def visit_while(self, while_):
@@ -173,7 +273,7 @@ class Resolver(ExpressionVisitor, StatementVisitor):
         enclosing_class = self.current_class
         self.current_class = ClassType.CLASS
 
-        self._declare(class_.name)
+        class_.slot = self._declare(class_.name)
         self._define(class_.name)
 
         if class_.superclass is not None and class_.name.lexeme == class_.superclass.name.lexeme:
@@ -185,10 +285,7 @@ class Resolver(ExpressionVisitor, StatementVisitor):
 
         if class_.superclass is not None:
             self._begin_scope()
-            self._peek_scope()["super"] = True
-
-        self._begin_scope()
-        self._peek_scope()["this"] = True
+            self._add_local("super")
 
         for method in class_.methods:
             declaration = FunctionType.METHOD
@@ -197,8 +294,6 @@ class Resolver(ExpressionVisitor, StatementVisitor):
 
             self._resolve_function(method, declaration)
 
-        self._end_scope()
-
         if class_.superclass is not None:
             self._end_scope()
 
@@ -1,6 +1,7 @@
+import re
 import typing
 
-from .grammar import Token, TokenType
+from .grammar import Token, TokenBuffer, TokenType
 from .lox import Lox
 
 
@@ -32,6 +33,12 @@ class Scanner:
         self.source = source
         self.tokens: typing.List[Token] = []
 
+        # per-compilation symbol table, repeated names share a single string object
+        self.symbols: typing.Dict[str, str] = {
+            name: name
+            for name in (*self.keywords, "init")
+        }
+
         self.start = 0
         self.current = 0
         self.line = 1
@@ -45,12 +52,29 @@ class Scanner:
         return self.source[self.start:self.current]
 
     def scan_tokens(self):
+        return list(self.iterate_tokens())
+
+    def scan_buffer(self):
+        buffer = TokenBuffer(self.source, self.symbols)
+
+        # `start` and `current` delimit the lexeme of the token being produced
+        for token in self.iterate_tokens():
+            buffer.append(token.type, self.start, self.current, token.line)
+
+        return buffer
+
+    def iterate_tokens(self):
+        tokens = self.tokens
+
         while not self.is_at_end:
             self.start = self.current
             self.scan_token()
 
-        self.tokens.append(Token(TokenType.EOF, "", None, self.line))
-        return self.tokens
+            yield from tokens
+            tokens.clear()
+
+        self.start = self.current
+        yield Token(TokenType.EOF, "", None, self.line)
 
     def scan_token(self):
         character = self.advance()
@@ -128,7 +152,7 @@ class Scanner:
         # closing "
         self.advance()
 
-        value = self.source[self.start + 1:self.current - 1]
+        value = self.intern(self.source[self.start + 1:self.current - 1])
         self.add_token(TokenType.STRING, value)
 
     def number(self):
@@ -149,8 +173,13 @@ class Scanner:
         while self.is_alpha_or_number(self.peek()):
             self.advance()
 
-        type = self.keywords.get(self.text, TokenType.IDENTIFIER)
-        self.add_token(type)
+        text = self.intern(self.text)
+
+        type = self.keywords.get(text, TokenType.IDENTIFIER)
+        self.tokens.append(Token(type, text, None, self.line))
+
+    def intern(self, text: str):
+        return self.symbols.setdefault(text, text)
 
     def is_number(self, character: str):
         return character.isnumeric()
@@ -163,3 +192,102 @@ class Scanner:
 
     def error(self, line: int, message: str):
         Lox.error(line, message)
+
+
+class FastScanner(Scanner):
+    """
+    Scanner consuming whole runs of characters per regex match.
+
+    Whitespace, newlines and comments are skipped in bulk. Anything the pattern does not
+    cover (non-ASCII characters, unterminated strings, unexpected characters) is handed
+    back to the reference `Scanner.scan_token`, so both produce the same tokens.
+    """
+
+    operators = {
+        "(": TokenType.LEFT_PAREN,
+        ")": TokenType.RIGHT_PAREN,
+        "{": TokenType.LEFT_BRACE,
+        "}": TokenType.RIGHT_BRACE,
+        ",": TokenType.COMMA,
+        ".": TokenType.DOT,
+        "-": TokenType.MINUS,
+        "+": TokenType.PLUS,
+        ";": TokenType.SEMICOLON,
+        "/": TokenType.SLASH,
+        "*": TokenType.STAR,
+        "!": TokenType.BANG,
+        "!=": TokenType.BANG_EQUAL,
+        "=": TokenType.EQUAL,
+        "==": TokenType.EQUAL_EQUAL,
+        ">": TokenType.GREATER,
+        ">=": TokenType.GREATER_EQUAL,
+        "<": TokenType.LESS,
+        "<=": TokenType.LESS_EQUAL,
+    }
+
+    # identifiers and numbers followed by a non-ASCII character are left to the reference
+    # scanner, as `str.isalpha()` and `str.isnumeric()` would keep consuming them
+    pattern = re.compile(
+        r"""
+        [ \t\r]*
+        (?:
+            (?P<skip>(?:\n|//[^\n]*)(?:[ \t\r\n]+|//[^\n]*)*)
+            |(?P<identifier>(?>[A-Za-z_][A-Za-z0-9_]*)(?![^\x00-\x7f]))
+            |(?P<operator>[!=<>]=?|[(){},.\-+;*/])
+            |(?P<number>(?>[0-9]+(?:\.[0-9]+)?)(?!\.?[^\x00-\x7f]))
+            |(?P<string>"[^"]*")
+            |(?P<other>.)
+        )
+        """,
+        re.VERBOSE | re.DOTALL
+    )
+
+    def iterate_tokens(self):
+        source = self.source
+        tokens = self.tokens
+        keywords = self.keywords
+        operators = self.operators
+        intern = self.symbols.setdefault
+        finditer = self.pattern.finditer
+
+        line = 1
+        position = 0
+        while True:
+            for match in finditer(source, position):
+                kind = match.lastgroup
+                text = match.group(kind)
+
+                self.start = match.start(kind)
+                self.current = match.end()
+
+                if kind == "identifier":
+                    text = intern(text, text)
+                    yield Token(keywords.get(text, TokenType.IDENTIFIER), text, None, line)
+                elif kind == "operator":
+                    yield Token(operators[text], text, None, line)
+                elif kind == "skip":
+                    line += text.count("\n")
+                elif kind == "number":
+                    yield Token(TokenType.NUMBER, text, float(text), line)
+                elif kind == "string":
+                    line += text.count("\n")
+                    value = text[1:-1]
+                    yield Token(TokenType.STRING, text, intern(value, value), line)
+                elif kind == "other":
+                    self.current = self.start
+                    self.line = line
+
+                    self.scan_token()
+
+                    yield from tokens
+                    tokens.clear()
+
+                    position = self.current
+                    line = self.line
+                    break
+            else:
+                break
+
+        self.line = line
+        self.start = self.current = len(source)
+        yield Token(TokenType.EOF, "", None, line)
@@ -19,7 +19,7 @@ class ExpressionStatement(Statement):
     expression: Expression
 
     def visit(self, visitor: "StatementVisitor"):
-        visitor.visit_expression(self)
+        return visitor.visit_expression(self)
 
 
 @dataclasses.dataclass
@@ -29,8 +29,12 @@ class FunctionStatement(Statement):
     parameters: typing.List[Token]
     body: typing.List[Statement]
 
+    # set by the Resolver, `slot` is None for globals
+    slot: typing.Optional[int] = None
+    frame_size: int = 0
+
     def visit(self, visitor: "StatementVisitor"):
-        visitor.visit_function(self)
+        return visitor.visit_function(self)
 
 
 @dataclasses.dataclass
@@ -40,8 +44,11 @@ class IfStatement(Statement):
     then_branch: Statement
     else_branch: typing.Optional[Statement]
 
+    # set from a type profile, how many times the then and else branches ran
+    taken: typing.Optional[typing.Tuple[int, int]] = dataclasses.field(default=None, repr=False, compare=False)
+
     def visit(self, visitor: "StatementVisitor"):
-        visitor.visit_if(self)
+        return visitor.visit_if(self)
 
 
 @dataclasses.dataclass
@@ -50,7 +57,7 @@ class PrintStatement(Statement):
     expression: Expression
 
     def visit(self, visitor: "StatementVisitor"):
-        visitor.visit_print(self)
+        return visitor.visit_print(self)
 
 
 @dataclasses.dataclass
@@ -59,8 +66,11 @@ class ReturnStatement(Statement):
     keyword: Token
     value: typing.Optional[Expression]
 
+    # set by the Resolver when the value is a call whose result the function returns as is
+    tail_call: bool = False
+
     def visit(self, visitor: "StatementVisitor"):
-        visitor.visit_return(self)
+        return visitor.visit_return(self)
 
 
 @dataclasses.dataclass
@@ -70,7 +80,7 @@ class WhileStatement(Statement):
     body: Statement
 
     def visit(self, visitor: "StatementVisitor"):
-        visitor.visit_while(self)
+        return visitor.visit_while(self)
 
 
 @dataclasses.dataclass
@@ -79,8 +89,11 @@ class VariableStatement(Statement):
     name: Token
     initializer: typing.Optional[Expression]
 
+    # set by the Resolver, None for globals
+    slot: typing.Optional[int] = None
+
     def visit(self, visitor: "StatementVisitor"):
-        visitor.visit_variable_statement(self)
+        return visitor.visit_variable_statement(self)
 
 
 @dataclasses.dataclass
@@ -88,8 +101,12 @@ class BlockStatement(Statement):
 
     statements: typing.List[Expression]
 
+    # set by the Resolver, an `inline` block keeps its variables in the enclosing frame
+    frame_size: int = 0
+    inline: bool = False
+
     def visit(self, visitor: "StatementVisitor"):
-        visitor.visit_block(self)
+        return visitor.visit_block(self)
 
 
 @dataclasses.dataclass
@@ -99,8 +116,11 @@ class ClassStatement(Statement):
     superclass: typing.Optional[Variable]
     methods: typing.List[FunctionStatement]
 
+    # set by the Resolver, None for globals
+    slot: typing.Optional[int] = None
+
     def visit(self, visitor: "StatementVisitor"):
-        visitor.visit_class(self)
+        return visitor.visit_class(self)
 
 
 class StatementVisitor:
@@ -0,0 +1,307 @@
+import types
+import typing
+
+from .class_ import LoxClass, LoxInstance
+from .error import RuntimeError
+from .evaluation import Interpreter
+from .expression import Call, Expression, Get
+from .function import LoxFunction, TailCall
+from .lox import Environment, Lox
+from .statement import Statement
+
+# entries of the explicit stack, each holding one suspended node or call
+STACK_SIZE = 1 << 18
+
+
+class TrampolineInterpreter(Interpreter):
+    """
+    Tree-walking engine keeping Lox frames on an explicit stack instead of Python's.
+
+    Visiting a node that needs others evaluated gives a generator, which yields the
+    generators of those nodes and is sent back their values; `run` drives them all from a
+    single loop. Leaves give their value directly, as in the `Interpreter`.
+    """
+
+    def __init__(self, stack_size: int = STACK_SIZE):
+        super().__init__()
+
+        self.stack_size = stack_size
+        self.stack: typing.List[typing.Generator] = []
+
+    def interpret(self, statements: typing.List[Statement]):
+        try:
+            for statement in statements:
+                self.execute(statement)
+        except RuntimeError as error:
+            Lox.report_runtime(error.token.line, str(error))
+
+    def interpret_expression(self, expression: Expression):
+        try:
+            value = self.evaluate(expression)
+            print(self.stringify(value))
+        except RuntimeError as error:
+            Lox.report_runtime(error.token.line, str(error))
+
+    def execute(self, statement: Statement):
+        return self.run(statement.visit(self))
+
+    def evaluate(self, expression: Expression):
+        return self.run(expression.visit(self))
+
+    def run(self, generator: typing.Any):
+        """drive `generator` and everything it yields, returning its value"""
+
+        if type(generator) is not types.GeneratorType:
+            return generator
+
+        stack = self.stack
+        base = len(stack)
+        environment = self.environment
+
+        stack.append(generator)
+        value = None
+
+        try:
+            while True:
+                try:
+                    child = stack[-1].send(value)
+                except StopIteration as stop:
+                    stack.pop()
+                    value = stop.value
+
+                    if len(stack) == base:
+                        return value
+
+                    continue
+
+                if type(child) is types.GeneratorType:
+                    stack.append(child)
+                    value = None
+                else:
+                    value = child
+        except BaseException:
+            # the suspended generators are dropped, their blocks can't restore the environment
+            del stack[base:]
+            self.environment = environment
+            raise
+
+    def execute_block(self, statements: typing.List[Statement], environment: Environment):
+        previous = self.environment
+        self.environment = environment
+
+        for statement in statements:
+            completion = yield statement.visit(self)
+
+            if completion is not None:
+                self.environment = previous
+                return completion
+
+        self.environment = previous
+        return None
+
+    def visit_expression(self, expression):
+        yield expression.expression.visit(self)
+
+    def visit_if(self, if_):
+        if self.is_truthy((yield if_.condition.visit(self))):
+            return (yield if_.then_branch.visit(self))
+
+        if if_.else_branch is not None:
+            return (yield if_.else_branch.visit(self))
+
+        return None
+
+    def visit_print(self, print_):
+        value = yield print_.expression.visit(self)
+        print(self.stringify(value))
+
+    def visit_return(self, return_):
+        value = None
+        if return_.value is not None:
+            if return_.tail_call and self.tail_calls:
+                return (yield self.tail_call(typing.cast(Call, return_.value)))
+
+            value = yield return_.value.visit(self)
+
+        return (value,)
+
+    def tail_call(self, call: Call):
+        receiver = None
+
+        if type(call.callee) is Get:
+            get = call.callee
+            receiver = yield get.object.visit(self)
+
+            callee = self.look_up_property(get, receiver)
+            if callee is None:
+                callee = receiver.values[get.index]
+                receiver = None
+        else:
+            callee = yield call.callee.visit(self)
+
+        arguments = yield self.evaluate_arguments(call)
+
+        self.check_call(call, callee, arguments)
+        return TailCall(callee, receiver, arguments)
+
+    def visit_while(self, while_):
+        while self.is_truthy((yield while_.condition.visit(self))):
+            completion = yield while_.body.visit(self)
+
+            if completion is not None:
+                return completion
+
+        return None
+
+    def visit_variable_statement(self, variable):
+        value = None
+        if variable.initializer is not None:
+            value = yield variable.initializer.visit(self)
+
+        self.define(variable.name, variable.slot, value)
+
+    def visit_block(self, block):
+        if block.inline:
+            return self.execute_statements(block.statements)
+
+        return self.execute_block(block.statements, Environment(self.environment, [None] * block.frame_size))
+
+    def execute_statements(self, statements: typing.List[Statement]):
+        for statement in statements:
+            completion = yield statement.visit(self)
+
+            if completion is not None:
+                return completion
+
+        return None
+
+    def visit_grouping(self, grouping):
+        return (yield grouping.expression.visit(self))
+
+    def visit_unary(self, unary):
+        right = yield unary.right.visit(self)
+
+        return unary.operation(unary.operator, right)
+
+    def visit_binary(self, binary):
+        left = yield binary.left.visit(self)
+        right = yield binary.right.visit(self)
+
+        return binary.operation(binary.operator, left, right)
+
+    def visit_assign_expression(self, assign):
+        value = yield assign.value.visit(self)
+
+        return self.assign(assign, value)
+
+    def visit_logical(self, logical):
+        left = yield logical.left.visit(self)
+
+        if (left is not None and left is not False) is logical.is_or:
+            return left
+
+        return (yield logical.right.visit(self))
+
+    def visit_call(self, call):
+        if type(call.callee) is Get:
+            return (yield self.invoke(call, call.callee))
+
+        callee = yield call.callee.visit(self)
+
+        return (yield self.call(call, callee))
+
+    def invoke(self, call: Call, get: Get):
+        instance = yield get.object.visit(self)
+
+        method = self.look_up_property(get, instance)
+        if method is None:
+            return (yield self.call(call, instance.values[get.index]))
+
+        arguments = yield self.evaluate_arguments(call)
+
+        self.check_call(call, method, arguments)
+        return (yield self.call_function(call, method, instance, arguments))
+
+    def call(self, call: Call, callee: typing.Any):
+        arguments = yield self.evaluate_arguments(call)
+
+        self.check_call(call, callee, arguments)
+        return (yield self.apply(call, callee, arguments))
+
+    def apply(self, call: Call, callee: typing.Any, arguments: typing.List[typing.Any]):
+        if isinstance(callee, LoxFunction):
+            return (yield self.call_function(call, callee, callee.receiver, arguments))
+
+        if isinstance(callee, LoxClass):
+            instance = LoxInstance(callee)
+
+            if callee.initializer is not None:
+                yield self.call_function(call, callee.initializer, instance, arguments)
+
+            return instance
+
+        return callee.call(self, arguments)
+
+    def evaluate_arguments(self, call: Call):
+        arguments = []
+
+        for argument in call.arguments:
+            arguments.append((yield argument.visit(self)))
+
+        return arguments
+
+    def call_function(
+        self,
+        call: Call,
+        function: LoxFunction,
+        receiver: typing.Optional[LoxInstance],
+        arguments: typing.List[typing.Any],
+    ):
+        # only calls deepen the stack further than the nesting of the source
+        if len(self.stack) > self.stack_size:
+            raise RuntimeError(call.parenthesis, "Stack overflow.")
+
+        completion = yield self.execute_block(function.declaration.body, function.frame(receiver, arguments))
+
+        if function.is_initializer:
+            return receiver
+
+        # the callee of a tail call replaces the frame of the function returning it
+        while type(completion) is TailCall:
+            function = completion.function
+            receiver = completion.receiver
+
+            if not isinstance(function, LoxFunction) or function.is_initializer:
+                if receiver is not None:
+                    return (yield self.call_function(call, function, receiver, completion.arguments))
+
+                return (yield self.apply(call, function, completion.arguments))
+
+            if receiver is None:
+                receiver = function.receiver
+
+            completion = yield self.execute_block(function.declaration.body, function.frame(receiver, completion.arguments))
+
+        if completion is not None:
+            return completion[0]
+
+        return None
+
+    def visit_get(self, get):
+        object = yield get.object.visit(self)
+
+        method = self.look_up_property(get, object)
+        if method is None:
+            return object.values[get.index]
+
+        return method.bind(object)
+
+    def visit_set(self, set):
+        object = yield set.object.visit(self)
+
+        if not isinstance(object, LoxInstance):
+            raise RuntimeError(set.name, "Only instances have properties.")
+
+        value = yield set.value.visit(self)
+
+        return self.store_property(set, object, value)
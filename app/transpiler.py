@@ -0,0 +1,762 @@
+import builtins
+import contextlib
+import dataclasses
+import math
+import types
+import typing
+
+from .class_ import LoxClass, LoxInstance
+from .evaluation import Interpreter
+from .expression import Expression, ExpressionVisitor, Literal
+from .function import Callable
+from .grammar import TokenType
+from .lox import Lox
+from .statement import BlockStatement, ClassStatement, FunctionStatement, Statement, StatementVisitor, VariableStatement
+
+# returned by the functions wrapping loop blocks when they complete without a `return`
+NO_RETURN = object()
+
+
+class TranspiledError(builtins.RuntimeError):
+    """
+    Runtime error of a transpiled program, the line is found from the line map of the module.
+    """
+
+    line: int = 0
+
+
+class TranspiledFunction(Callable):
+
+    __slots__ = ("name", "function")
+
+    def __init__(self, name: str, arity: int, function: typing.Callable):
+        self.name = name
+        self.function = function
+        self.arity = arity
+
+    def call(self, interpreter, arguments):
+        return self.function(*arguments)
+
+    def invoke(self, interpreter, receiver: LoxInstance, arguments: typing.List[typing.Any]):
+        return self.function(receiver, *arguments)
+
+    def bind(self, instance: LoxInstance):
+        return TranspiledFunction(self.name, self.arity, types.MethodType(self.function, instance))
+
+    def __str__(self):
+        return f"<fn {self.name}>"
+
+
+def call(callee: typing.Any, arguments: typing.List[typing.Any]):
+    if not isinstance(callee, Callable):
+        raise TranspiledError("Can only call functions and classes.")
+
+    if len(arguments) != callee.arity:
+        raise TranspiledError(f"Expected {callee.arity} arguments but got {len(arguments)}.")
+
+    return callee.call(None, arguments)
+
+
+def get_property(instance: typing.Any, name: str):
+    if not isinstance(instance, LoxInstance):
+        raise TranspiledError("Only instances have properties.")
+
+    index = instance.shape.indexes.get(name)
+    if index is not None:
+        return instance.values[index]
+
+    method = instance.klass.find_method(name)
+    if method is None:
+        raise TranspiledError(f"Undefined property '{name}'.")
+
+    return method.bind(instance)
+
+
+def get_super_method(superclass: LoxClass, instance: LoxInstance, name: str):
+    method = superclass.find_method(name)
+    if method is None:
+        raise TranspiledError(f"Undefined property '{name}'.")
+
+    return method.bind(instance)
+
+
+def number_error():
+    raise TranspiledError("Operand must be a number.")
+
+
+def operands_error():
+    raise TranspiledError("Operands must be two numbers or two strings.")
+
+
+def instance_error():
+    raise TranspiledError("Only instances have properties.")
+
+
+def superclass_error():
+    raise TranspiledError("Superclass must be a class.")
+
+
+# names the generated modules are executed with
+RUNTIME = {
+    "_Function": TranspiledFunction,
+    "_Class": LoxClass,
+    "_Instance": LoxInstance,
+    "_NO_RETURN": NO_RETURN,
+    "_call": call,
+    "_get": get_property,
+    "_super": get_super_method,
+    "_number_error": number_error,
+    "_operands_error": operands_error,
+    "_instance_error": instance_error,
+    "_superclass_error": superclass_error,
+}
+
+
+@dataclasses.dataclass
+class PythonFunction:
+    """Python function being generated, lines are `(indent, code, lox line)`."""
+
+    enclosing: typing.Optional["PythonFunction"]
+    is_initializer: bool = False
+    lines: typing.List[typing.Tuple[int, str, int]] = dataclasses.field(default_factory=list)
+    indent: int = 1
+    locals: typing.Set[str] = dataclasses.field(default_factory=set)
+    globals: typing.Set[str] = dataclasses.field(default_factory=set)
+    nonlocals: typing.Set[str] = dataclasses.field(default_factory=set)
+    temporaries: int = 0
+    loop_depth: int = 0
+
+
+class Transpiler(ExpressionVisitor, StatementVisitor):
+    """
+    Translates resolved statements into the source of a Python module.
+
+    Expressions are flattened into one assignment per operation, so that every generated line
+    maps back to the Lox line of the operator that can fail on it. Lox globals become module
+    globals prefixed with `g_`, locals get a unique `l_<name>_<n>` name per declaration.
+    """
+
+    def __init__(self):
+        self.function: typing.Optional[PythonFunction] = None
+        self.scopes: typing.List[typing.Dict[str, str]] = []
+        self.names = 0
+        self.line = 1
+
+    def transpile_script(self, statements: typing.List[Statement]):
+        main = self.begin_function(False)
+
+        for statement in statements:
+            statement.visit(self)
+
+        self.end_function()
+        return self.assemble(main, "def __lox_main__():")
+
+    def transpile_expression(self, expression: Expression):
+        main = self.begin_function(False)
+
+        value = expression.visit(self)
+        self.emit(f"return {value}")
+
+        self.end_function()
+        return self.assemble(main, "def __lox_main__():")
+
+    def assemble(self, main: PythonFunction, header: str):
+        sources = ["# generated from a Lox program", header]
+        lines = [0, 0, 1]
+
+        for indent, code, line in self.function_lines(main, 0):
+            sources.append("    " * indent + code)
+            lines.append(line)
+
+        sources.append(f"__lox_lines__ = {tuple(lines)!r}")
+        return "\n".join(sources) + "\n"
+
+    def function_lines(self, function: PythonFunction, indent: int):
+        declarations = []
+
+        if function.globals:
+            declarations.append((indent + 1, f"global {', '.join(sorted(function.globals))}", self.line))
+
+        if function.nonlocals:
+            declarations.append((indent + 1, f"nonlocal {', '.join(sorted(function.nonlocals))}", self.line))
+
+        body = [
+            (indent + line_indent, code, line)
+            for line_indent, code, line in function.lines
+        ]
+
+        if not body:
+            body.append((indent + 1, "pass", self.line))
+
+        return declarations + body
+
+    def begin_function(self, is_initializer: bool):
+        self.function = PythonFunction(self.function, is_initializer)
+        return self.function
+
+    def end_function(self):
+        function = self.function
+        self.function = function.enclosing
+
+        return function
+
+    def emit_function(self, name: str, parameters: typing.List[str], function: PythonFunction):
+        self.emit(f"def {name}({', '.join(parameters)}):")
+
+        for indent, code, line in self.function_lines(function, self.function.indent):
+            self.function.lines.append((indent, code, line))
+
+    def emit(self, code: str):
+        self.function.lines.append((self.function.indent, code, self.line))
+
+    @contextlib.contextmanager
+    def indented(self):
+        function = self.function
+        start = len(function.lines)
+
+        function.indent += 1
+        yield
+        function.indent -= 1
+
+        if len(function.lines) == start:
+            function.lines.append((function.indent + 1, "pass", self.line))
+
+    def temporary(self):
+        self.function.temporaries += 1
+        return f"_t{self.function.temporaries}"
+
+    def begin_scope(self):
+        self.scopes.append({})
+
+    def end_scope(self):
+        self.scopes.pop()
+
+    def unique(self, prefix: str):
+        self.names += 1
+        return f"{prefix}{self.names}"
+
+    def declare(self, name: str, is_global: bool):
+        if is_global:
+            python_name = f"g_{name}"
+            self.function.globals.add(python_name)
+        else:
+            python_name = self.unique(f"l_{name}_")
+
+            self.scopes[-1][name] = python_name
+            self.function.locals.add(python_name)
+
+        return python_name
+
+    def look_up(self, name: str):
+        for scope in reversed(self.scopes):
+            python_name = scope.get(name)
+
+            if python_name is not None:
+                return python_name
+
+        return None
+
+    def assign(self, python_name: str, value: str):
+        if python_name.startswith("g_"):
+            self.function.globals.add(python_name)
+        elif python_name not in self.function.locals:
+            self.function.nonlocals.add(python_name)
+
+        self.emit(f"{python_name} = {value}")
+
+    def operands(self, expressions: typing.List[Expression]):
+        values = []
+        ends = []
+
+        for expression in expressions:
+            values.append(expression.visit(self))
+            ends.append(len(self.function.lines))
+
+        # a variable read early must be copied when code running after it could assign it
+        for index in range(len(values) - 2, -1, -1):
+            if values[index].startswith("l_") and ends[index] != ends[-1]:
+                copy = self.temporary()
+                self.function.lines.insert(ends[index], (self.function.indent, f"{copy} = {values[index]}", self.line))
+                values[index] = copy
+
+        return values
+
+    def number_check(self, expressions: typing.List[Expression], values: typing.List[str]):
+        checks = [
+            f"type({value}) is float"
+            for expression, value in zip(expressions, values)
+            if not (isinstance(expression, Literal) and type(expression.value) is float)
+        ]
+
+        return " and ".join(checks)
+
+    def named(self, value: str):
+        """`is` comparisons need a name, comparing literals with it is a warning"""
+
+        if value.isidentifier():
+            return value
+
+        copy = self.temporary()
+        self.emit(f"{copy} = {value}")
+
+        return copy
+
+    def truthy(self, value: str):
+        return f"{value} is not None and {value} is not False"
+
+    def falsey(self, value: str):
+        return f"{value} is None or {value} is False"
+
+    def declares_closures(self, block: BlockStatement):
+        """blocks that need a new set of variables on every iteration of a loop"""
+
+        declares = any(
+            isinstance(statement, (VariableStatement, FunctionStatement, ClassStatement))
+            for statement in block.statements
+        )
+
+        return declares and self.contains_closures(block.statements)
+
+    def contains_closures(self, statements: typing.List[Statement]):
+        for statement in statements:
+            if isinstance(statement, (FunctionStatement, ClassStatement)):
+                return True
+
+            children = [
+                child
+                for child in vars(statement).values()
+                if isinstance(child, Statement)
+            ]
+
+            if isinstance(statement, BlockStatement):
+                children.extend(statement.statements)
+
+            if self.contains_closures(children):
+                return True
+
+        return False
+
+    def transpile_function(self, function: FunctionStatement, python_name: str, receiver: typing.Optional[str], is_initializer: bool):
+        self.line = function.name.line
+
+        self.begin_function(is_initializer)
+        self.begin_scope()
+
+        parameters = []
+        if receiver is not None:
+            self.scopes[-1]["this"] = receiver
+            parameters.append(receiver)
+
+        for parameter in function.parameters:
+            parameters.append(self.declare(parameter.lexeme, False))
+
+        for statement in function.body:
+            statement.visit(self)
+
+        if is_initializer:
+            self.emit("return this")
+
+        self.end_scope()
+        body = self.end_function()
+
+        self.emit_function(python_name, parameters, body)
+
+    def visit_expression(self, expression):
+        expression.expression.visit(self)
+
+    def visit_function(self, function):
+        name = function.name.lexeme
+
+        # declared first so that the function can refer to itself
+        python_name = self.declare(name, function.slot is None)
+        self.transpile_function(function, python_name, None, False)
+
+        self.emit(f"{python_name} = _Function({name!r}, {len(function.parameters)}, {python_name})")
+
+    def visit_if(self, if_):
+        condition = self.named(if_.condition.visit(self))
+
+        self.emit(f"if {self.truthy(condition)}:")
+        with self.indented():
+            if_.then_branch.visit(self)
+
+        if if_.else_branch is not None:
+            self.emit("else:")
+            with self.indented():
+                if_.else_branch.visit(self)
+
+    def visit_print(self, print_):
+        value = print_.expression.visit(self)
+        self.emit(f"print(_stringify({value}))")
+
+    def visit_return(self, return_):
+        self.line = return_.keyword.line
+
+        if self.function.is_initializer:
+            self.emit("return this")
+        elif return_.value is None:
+            self.emit("return None")
+        else:
+            value = return_.value.visit(self)
+            self.emit(f"return {value}")
+
+    def visit_while(self, while_):
+        function = self.function
+
+        header = len(function.lines)
+        self.emit("while True:")
+
+        function.indent += 1
+        condition = self.named(while_.condition.visit(self))
+
+        if len(function.lines) == header + 1:
+            # the condition is a plain value, it can be tested by the loop itself
+            function.lines[header] = (function.indent - 1, f"while {self.truthy(condition)}:", self.line)
+        else:
+            self.emit(f"if {self.falsey(condition)}:")
+            self.emit("    break")
+
+        function.loop_depth += 1
+        while_.body.visit(self)
+        function.loop_depth -= 1
+
+        if len(function.lines) == header + 1:
+            self.emit("pass")
+
+        function.indent -= 1
+
+    def visit_variable_statement(self, variable):
+        self.line = variable.name.line
+
+        if variable.initializer is None:
+            value = "None"
+        else:
+            value = variable.initializer.visit(self)
+
+        python_name = self.declare(variable.name.lexeme, variable.slot is None)
+        self.emit(f"{python_name} = {value}")
+
+    def visit_block(self, block):
+        if not self.function.loop_depth or not self.declares_closures(block):
+            self.begin_scope()
+
+            for statement in block.statements:
+                statement.visit(self)
+
+            self.end_scope()
+            return
+
+        # every iteration gets its own variables, closures must not share them
+        self.begin_function(self.function.is_initializer)
+        self.begin_scope()
+
+        for statement in block.statements:
+            statement.visit(self)
+
+        self.emit("return _NO_RETURN")
+
+        self.end_scope()
+        body = self.end_function()
+
+        python_name = self.unique("_block")
+        self.emit_function(python_name, [], body)
+
+        completion = self.temporary()
+        self.emit(f"{completion} = {python_name}()")
+        self.emit(f"if {completion} is not _NO_RETURN:")
+        self.emit(f"    return {completion}")
+
+    def visit_class(self, class_):
+        name = class_.name.lexeme
+
+        superclass = None
+        if class_.superclass is not None:
+            superclass = class_.superclass.visit(self)
+
+            self.line = class_.superclass.name.line
+            self.emit(f"if not isinstance({superclass}, _Class):")
+            self.emit("    _superclass_error()")
+
+        self.line = class_.name.line
+        python_name = self.declare(name, class_.slot is None)
+        self.emit(f"{python_name} = None")
+
+        self.begin_scope()
+
+        if superclass is not None:
+            super_name = self.unique("super_")
+            self.scopes[-1]["super"] = super_name
+            self.emit(f"{super_name} = {superclass}")
+
+        methods = []
+        for method in class_.methods:
+            method_name = method.name.lexeme
+            is_initializer = "init" == method_name
+
+            function_name = self.unique("_method")
+            self.transpile_function(method, function_name, "this", is_initializer)
+
+            methods.append(f"{method_name!r}: _Function({method_name!r}, {len(method.parameters)}, {function_name})")
+
+        self.end_scope()
+
+        self.line = class_.name.line
+        self.assign(python_name, f"_Class({name!r}, {superclass}, {{{', '.join(methods)}}})")
+
+    def visit_literal(self, literal):
+        value = literal.value
+
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return f"float({str(value)!r})"
+
+            if math.copysign(1.0, value) < 0:
+                return f"({value!r})"
+
+        return repr(value)
+
+    def visit_grouping(self, grouping):
+        return grouping.expression.visit(self)
+
+    def visit_unary(self, unary):
+        right = unary.right.visit(self)
+
+        self.line = unary.operator.line
+        result = self.temporary()
+
+        match unary.operator.type:
+            case TokenType.MINUS:
+                self.emit(f"{result} = -{right} if type({right}) is float else _number_error()")
+
+            case TokenType.BANG:
+                right = self.named(right)
+                self.emit(f"{result} = {self.falsey(right)}")
+
+        return result
+
+    def visit_binary(self, binary):
+        expressions = [binary.left, binary.right]
+        left, right = self.operands(expressions)
+
+        self.line = binary.operator.line
+        result = self.temporary()
+
+        match binary.operator.type:
+            case TokenType.PLUS:
+                numbers = self.number_check(expressions, [left, right]) or "True"
+                strings = f"type({left}) is str and type({right}) is str"
+                self.emit(f"{result} = {left} + {right} if ({numbers}) or ({strings}) else _operands_error()")
+
+            case TokenType.EQUAL_EQUAL:
+                left, right = self.named(left), self.named(right)
+                self.emit(f"{result} = ({right} is None) if {left} is None else ({left} == {right})")
+
+            case TokenType.BANG_EQUAL:
+                left, right = self.named(left), self.named(right)
+                self.emit(f"{result} = ({right} is not None) if {left} is None else not ({left} == {right})")
+
+            case operator_type:
+                operator = OPERATORS[operator_type]
+                numbers = self.number_check(expressions, [left, right])
+
+                if numbers:
+                    self.emit(f"{result} = {left} {operator} {right} if {numbers} else _number_error()")
+                else:
+                    self.emit(f"{result} = {left} {operator} {right}")
+
+        return result
+
+    def visit_variable_expression(self, variable):
+        self.line = variable.name.line
+
+        if variable.depth is not None:
+            python_name = self.look_up(variable.name.lexeme)
+
+            if python_name is not None:
+                return python_name
+
+        # reading an undefined global raises a NameError on this line
+        result = self.temporary()
+        self.emit(f"{result} = g_{variable.name.lexeme}")
+
+        return result
+
+    def visit_assign_expression(self, assign):
+        value = assign.value.visit(self)
+        self.line = assign.name.line
+
+        python_name = None
+        if assign.depth is not None:
+            python_name = self.look_up(assign.name.lexeme)
+
+        if python_name is None:
+            python_name = f"g_{assign.name.lexeme}"
+
+            # globals must exist before being assigned
+            self.function.globals.add(python_name)
+            self.emit(python_name)
+
+        self.assign(python_name, value)
+        return value
+
+    def visit_logical(self, logical):
+        left = logical.left.visit(self)
+
+        result = self.temporary()
+        self.emit(f"{result} = {left}")
+
+        if logical.operator.type == TokenType.OR:
+            self.emit(f"if {self.falsey(result)}:")
+        else:
+            self.emit(f"if {self.truthy(result)}:")
+
+        with self.indented():
+            right = logical.right.visit(self)
+            self.emit(f"{result} = {right}")
+
+        return result
+
+    def visit_call(self, call):
+        callee, *arguments = self.operands([call.callee, *call.arguments])
+
+        self.line = call.parenthesis.line
+        result = self.temporary()
+        values = ", ".join(arguments)
+
+        self.emit(f"if type({callee}) is _Function and {callee}.arity == {len(arguments)}:")
+        self.emit(f"    {result} = {callee}.function({values})")
+        self.emit("else:")
+        self.emit(f"    {result} = _call({callee}, [{values}])")
+
+        return result
+
+    def visit_get(self, get):
+        instance = get.object.visit(self)
+
+        self.line = get.name.line
+        result = self.temporary()
+        name = repr(get.name.lexeme)
+
+        # the temporary first holds the index of the field in the instance's shape
+        self.emit(f"{result} = {instance}.values[{result}] if type({instance}) is _Instance and ({result} := {instance}.shape.indexes.get({name})) is not None else _get({instance}, {name})")
+
+        return result
+
+    def visit_set(self, set):
+        instance = set.object.visit(self)
+
+        if instance.startswith("l_"):
+            copy = self.temporary()
+            self.emit(f"{copy} = {instance}")
+            instance = copy
+
+        self.line = set.name.line
+        self.emit(f"if type({instance}) is not _Instance:")
+        self.emit("    _instance_error()")
+
+        value = set.value.visit(self)
+
+        self.line = set.name.line
+        self.emit(f"{instance}.set_field({set.name.lexeme!r}, {value})")
+
+        return value
+
+    def visit_this(self, this):
+        return self.look_up("this")
+
+    def visit_super(self, super_):
+        self.line = super_.method.line
+        result = self.temporary()
+
+        self.emit(f"{result} = _super({self.look_up('super')}, {self.look_up('this')}, {super_.method.lexeme!r})")
+
+        return result
+
+
+OPERATORS = {
+    TokenType.MINUS: "-",
+    TokenType.SLASH: "/",
+    TokenType.STAR: "*",
+    TokenType.GREATER: ">",
+    TokenType.GREATER_EQUAL: ">=",
+    TokenType.LESS: "<",
+    TokenType.LESS_EQUAL: "<=",
+}
+
+
+class TranspiledInterpreter(Interpreter):
+    """
+    Engine running Lox programs as Python modules generated by the `Transpiler`.
+    """
+
+    def __init__(self):
+        super().__init__()
+
+        self.namespace = {
+            "__builtins__": builtins,
+            "_stringify": self.stringify,
+            **RUNTIME,
+        }
+
+        # line maps of the modules run so far, by file name, their functions may still be called
+        self.line_maps: typing.Dict[str, typing.Tuple[int, ...]] = {}
+
+        # natives defined by the base interpreter
+        for name, cell in self.globals.cells.items():
+            self.namespace[f"g_{name}"] = cell.value
+
+    def transpile(self, statements: typing.List[Statement]):
+        return Transpiler().transpile_script(statements)
+
+    def interpret(self, statements: typing.List[Statement]):
+        self.interpret_module(self.transpile(statements))
+
+    def interpret_module(self, source: str):
+        try:
+            self.run_module(source)
+        except TranspiledError as error:
+            Lox.report_runtime(error.line, str(error))
+
+    def interpret_expression(self, expression: Expression):
+        source = Transpiler().transpile_expression(expression)
+
+        try:
+            value = self.run_module(source)
+            print(self.stringify(value))
+        except TranspiledError as error:
+            Lox.report_runtime(error.line, str(error))
+
+    def run_module(self, source: str):
+        filename = f"<lox module {len(self.line_maps)}>"
+        exec(compile(source, filename, "exec"), self.namespace)
+
+        main = self.namespace.pop("__lox_main__")
+        self.line_maps[filename] = self.namespace.pop("__lox_lines__")
+
+        try:
+            return main()
+        except TranspiledError as error:
+            error.line = self.line_of(error)
+            raise
+        except NameError as error:
+            if not error.name or not error.name.startswith("g_"):
+                raise
+
+            undefined = TranspiledError(f"Undefined variable '{error.name[2:]}'.")
+            undefined.line = self.line_of(error)
+
+            raise undefined from None
+
+    def line_of(self, error: BaseException):
+        line = 0
+
+        # the innermost frame of a generated module is where the error happened
+        traceback = error.__traceback__
+        while traceback is not None:
+            lines = self.line_maps.get(traceback.tb_frame.f_code.co_filename)
+            if lines is not None:
+                line = lines[traceback.tb_lineno]
+
+            traceback = traceback.tb_next
+
+        return line
@@ -0,0 +1,517 @@
+import builtins
+import typing
+
+from .bytecode import BytecodeCompiler, FunctionPrototype, OpCode
+from .class_ import LoxClass, LoxInstance
+from .evaluation import Interpreter
+from .expression import Expression
+from .function import NativeFunction
+from .lox import UNDEFINED, Lox
+from .statement import Statement
+
+FRAMES_MAX = 1 << 16
+
+# opcodes as plain names, the dispatch loop compares against them on every instruction
+CONSTANT = OpCode.CONSTANT.value
+NIL = OpCode.NIL.value
+TRUE = OpCode.TRUE.value
+FALSE = OpCode.FALSE.value
+POP = OpCode.POP.value
+GET_LOCAL = OpCode.GET_LOCAL.value
+SET_LOCAL = OpCode.SET_LOCAL.value
+GET_GLOBAL = OpCode.GET_GLOBAL.value
+DEFINE_GLOBAL = OpCode.DEFINE_GLOBAL.value
+SET_GLOBAL = OpCode.SET_GLOBAL.value
+GET_UPVALUE = OpCode.GET_UPVALUE.value
+SET_UPVALUE = OpCode.SET_UPVALUE.value
+GET_PROPERTY = OpCode.GET_PROPERTY.value
+SET_PROPERTY = OpCode.SET_PROPERTY.value
+CHECK_INSTANCE = OpCode.CHECK_INSTANCE.value
+GET_SUPER = OpCode.GET_SUPER.value
+EQUAL = OpCode.EQUAL.value
+NOT_EQUAL = OpCode.NOT_EQUAL.value
+GREATER = OpCode.GREATER.value
+GREATER_EQUAL = OpCode.GREATER_EQUAL.value
+LESS = OpCode.LESS.value
+LESS_EQUAL = OpCode.LESS_EQUAL.value
+ADD = OpCode.ADD.value
+SUBTRACT = OpCode.SUBTRACT.value
+MULTIPLY = OpCode.MULTIPLY.value
+DIVIDE = OpCode.DIVIDE.value
+NOT = OpCode.NOT.value
+NEGATE = OpCode.NEGATE.value
+PRINT = OpCode.PRINT.value
+JUMP = OpCode.JUMP.value
+JUMP_IF_FALSE = OpCode.JUMP_IF_FALSE.value
+JUMP_IF_TRUE = OpCode.JUMP_IF_TRUE.value
+POP_JUMP_IF_FALSE = OpCode.POP_JUMP_IF_FALSE.value
+CALL = OpCode.CALL.value
+CLOSURE = OpCode.CLOSURE.value
+CLOSE_UPVALUE = OpCode.CLOSE_UPVALUE.value
+RETURN = OpCode.RETURN.value
+CLASS = OpCode.CLASS.value
+INHERIT = OpCode.INHERIT.value
+METHOD = OpCode.METHOD.value
+
+
+class VirtualMachineError(builtins.RuntimeError):
+    """
+    Runtime error of the VM, the line is taken from the instruction that raised it.
+    """
+
+    line: int = 0
+
+
+class Upvalue:
+    """
+    Variable captured by a closure.
+
+    While open, it points into the VM stack; once closed, into a list of its own.
+    """
+
+    __slots__ = ("values", "index")
+
+    def __init__(self, values: typing.List[typing.Any], index: int):
+        self.values = values
+        self.index = index
+
+    def close(self):
+        self.values = [self.values[self.index]]
+        self.index = 0
+
+
+class Closure:
+
+    __slots__ = ("function", "upvalues", "arity")
+
+    def __init__(self, function: FunctionPrototype, upvalues: typing.List[Upvalue]):
+        self.function = function
+        self.upvalues = upvalues
+        self.arity = function.arity
+
+    def bind(self, instance: LoxInstance):
+        return BoundMethod(instance, self)
+
+    def __str__(self):
+        return str(self.function)
+
+
+class BoundMethod:
+
+    __slots__ = ("receiver", "method")
+
+    def __init__(self, receiver: LoxInstance, method: Closure):
+        self.receiver = receiver
+        self.method = method
+
+    def __str__(self):
+        return str(self.method)
+
+
+class VirtualMachine(Interpreter):
+    """
+    Stack-based engine running the bytecode produced by the `BytecodeCompiler`.
+    """
+
+    def __init__(self):
+        super().__init__()
+
+        self.compiler = BytecodeCompiler(self.globals)
+
+    def interpret(self, statements: typing.List[Statement]):
+        function = self.compiler.compile_script(statements)
+
+        try:
+            self.run(function)
+        except VirtualMachineError as error:
+            Lox.report_runtime(error.line, str(error))
+
+    def interpret_expression(self, expression: Expression):
+        function = self.compiler.compile_expression(expression)
+
+        try:
+            value = self.run(function)
+            print(self.stringify(value))
+        except VirtualMachineError as error:
+            Lox.report_runtime(error.line, str(error))
+
+    def run(self, function: FunctionPrototype):
+        stringify = self.stringify
+
+        closure = Closure(function, [])
+        stack: typing.List[typing.Any] = [closure]
+        frames: typing.List[typing.Tuple[Closure, int, int]] = []
+        open_upvalues: typing.Dict[int, Upvalue] = {}
+
+        code = function.chunk.code
+        constants = function.chunk.constants
+        ip = 0
+        base = 0
+
+        try:
+            while True:
+                op = code[ip]
+                ip += 1
+
+                if op == GET_LOCAL:
+                    stack.append(stack[base + code[ip]])
+                    ip += 1
+
+                elif op == CONSTANT:
+                    stack.append(constants[code[ip]])
+                    ip += 1
+
+                elif op == GET_GLOBAL:
+                    cell = constants[code[ip]]
+                    ip += 1
+
+                    value = cell.value
+                    if value is UNDEFINED:
+                        raise VirtualMachineError(f"Undefined variable '{cell.name}'.")
+
+                    stack.append(value)
+
+                elif op == POP_JUMP_IF_FALSE:
+                    value = stack.pop()
+
+                    if value is None or value is False:
+                        ip = code[ip]
+                    else:
+                        ip += 1
+
+                elif op == LESS:
+                    b = stack.pop()
+                    a = stack[-1]
+
+                    if type(a) is not float or type(b) is not float:
+                        raise VirtualMachineError("Operand must be a number.")
+
+                    stack[-1] = a < b
+
+                elif op == ADD:
+                    b = stack.pop()
+                    a = stack[-1]
+
+                    if type(a) is float and type(b) is float:
+                        stack[-1] = a + b
+                    elif type(a) is str and type(b) is str:
+                        stack[-1] = a + b
+                    else:
+                        raise VirtualMachineError("Operands must be two numbers or two strings.")
+
+                elif op == SUBTRACT:
+                    b = stack.pop()
+                    a = stack[-1]
+
+                    if type(a) is not float or type(b) is not float:
+                        raise VirtualMachineError("Operand must be a number.")
+
+                    stack[-1] = a - b
+
+                elif op == CALL:
+                    count = code[ip]
+                    ip += 1
+
+                    callee = stack[-1 - count]
+                    kind = type(callee)
+
+                    if kind is BoundMethod:
+                        stack[-1 - count] = callee.receiver
+                        callee = callee.method
+
+                    elif kind is LoxClass:
+                        stack[-1 - count] = LoxInstance(callee)
+                        callee = callee.initializer
+
+                        if callee is None:
+                            if count:
+                                raise VirtualMachineError(f"Expected 0 arguments but got {count}.")
+
+                            continue
+
+                    elif kind is not Closure:
+                        if not isinstance(callee, NativeFunction):
+                            raise VirtualMachineError("Can only call functions and classes.")
+
+                        if count != callee.arity:
+                            raise VirtualMachineError(f"Expected {callee.arity} arguments but got {count}.")
+
+                        arguments = stack[len(stack) - count:]
+                        del stack[len(stack) - count - 1:]
+
+                        stack.append(callee.call(self, arguments))
+                        continue
+
+                    function = callee.function
+                    if count != function.arity:
+                        raise VirtualMachineError(f"Expected {function.arity} arguments but got {count}.")
+
+                    if len(frames) == FRAMES_MAX:
+                        raise VirtualMachineError("Stack overflow.")
+
+                    frames.append((closure, ip, base))
+
+                    closure = callee
+                    code = function.chunk.code
+                    constants = function.chunk.constants
+                    ip = 0
+                    base = len(stack) - count - 1
+
+                elif op == RETURN:
+                    result = stack.pop()
+
+                    if open_upvalues:
+                        self.close_upvalues(open_upvalues, base)
+
+                    del stack[base:]
+
+                    if not frames:
+                        return result
+
+                    closure, ip, base = frames.pop()
+                    code = closure.function.chunk.code
+                    constants = closure.function.chunk.constants
+
+                    stack.append(result)
+
+                elif op == SET_LOCAL:
+                    stack[base + code[ip]] = stack[-1]
+                    ip += 1
+
+                elif op == POP:
+                    stack.pop()
+
+                elif op == JUMP:
+                    ip = code[ip]
+
+                elif op == GET_UPVALUE:
+                    upvalue = closure.upvalues[code[ip]]
+                    ip += 1
+
+                    stack.append(upvalue.values[upvalue.index])
+
+                elif op == SET_UPVALUE:
+                    upvalue = closure.upvalues[code[ip]]
+                    ip += 1
+
+                    upvalue.values[upvalue.index] = stack[-1]
+
+                elif op == GET_PROPERTY:
+                    name = constants[code[ip]]
+                    ip += 1
+
+                    instance = stack[-1]
+                    if type(instance) is not LoxInstance:
+                        raise VirtualMachineError("Only instances have properties.")
+
+                    index = instance.shape.indexes.get(name)
+                    if index is not None:
+                        stack[-1] = instance.values[index]
+                    else:
+                        method = instance.klass.find_method(name)
+                        if method is None:
+                            raise VirtualMachineError(f"Undefined property '{name}'.")
+
+                        stack[-1] = BoundMethod(instance, method)
+
+                elif op == SET_PROPERTY:
+                    name = constants[code[ip]]
+                    ip += 1
+
+                    value = stack.pop()
+                    instance = stack[-1]
+                    if type(instance) is not LoxInstance:
+                        raise VirtualMachineError("Only instances have properties.")
+
+                    instance.set_field(name, value)
+                    stack[-1] = value
+
+                elif op == NIL:
+                    stack.append(None)
+
+                elif op == TRUE:
+                    stack.append(True)
+
+                elif op == FALSE:
+                    stack.append(False)
+
+                elif op == EQUAL:
+                    b = stack.pop()
+                    a = stack[-1]
+
+                    if a is None:
+                        stack[-1] = b is None
+                    else:
+                        stack[-1] = a == b
+
+                elif op == NOT_EQUAL:
+                    b = stack.pop()
+                    a = stack[-1]
+
+                    if a is None:
+                        stack[-1] = b is not None
+                    else:
+                        stack[-1] = not a == b
+
+                elif op == GREATER:
+                    b = stack.pop()
+                    a = stack[-1]
+
+                    if type(a) is not float or type(b) is not float:
+                        raise VirtualMachineError("Operand must be a number.")
+
+                    stack[-1] = a > b
+
+                elif op == GREATER_EQUAL:
+                    b = stack.pop()
+                    a = stack[-1]
+
+                    if type(a) is not float or type(b) is not float:
+                        raise VirtualMachineError("Operand must be a number.")
+
+                    stack[-1] = a >= b
+
+                elif op == LESS_EQUAL:
+                    b = stack.pop()
+                    a = stack[-1]
+
+                    if type(a) is not float or type(b) is not float:
+                        raise VirtualMachineError("Operand must be a number.")
+
+                    stack[-1] = a <= b
+
+                elif op == MULTIPLY:
+                    b = stack.pop()
+                    a = stack[-1]
+
+                    if type(a) is not float or type(b) is not float:
+                        raise VirtualMachineError("Operand must be a number.")
+
+                    stack[-1] = a * b
+
+                elif op == DIVIDE:
+                    b = stack.pop()
+                    a = stack[-1]
+
+                    if type(a) is not float or type(b) is not float:
+                        raise VirtualMachineError("Operand must be a number.")
+
+                    stack[-1] = a / b
+
+                elif op == NOT:
+                    value = stack[-1]
+                    stack[-1] = value is None or value is False
+
+                elif op == NEGATE:
+                    value = stack[-1]
+
+                    if type(value) is not float:
+                        raise VirtualMachineError("Operand must be a number.")
+
+                    stack[-1] = -value
+
+                elif op == PRINT:
+                    print(stringify(stack.pop()))
+
+                elif op == JUMP_IF_FALSE:
+                    value = stack[-1]
+
+                    if value is None or value is False:
+                        ip = code[ip]
+                    else:
+                        ip += 1
+
+                elif op == JUMP_IF_TRUE:
+                    value = stack[-1]
+
+                    if value is None or value is False:
+                        ip += 1
+                    else:
+                        ip = code[ip]
+
+                elif op == DEFINE_GLOBAL:
+                    constants[code[ip]].value = stack.pop()
+                    ip += 1
+
+                elif op == SET_GLOBAL:
+                    cell = constants[code[ip]]
+                    ip += 1
+
+                    if cell.value is UNDEFINED:
+                        raise VirtualMachineError(f"Undefined variable '{cell.name}'.")
+
+                    cell.value = stack[-1]
+
+                elif op == CHECK_INSTANCE:
+                    if type(stack[-1]) is not LoxInstance:
+                        raise VirtualMachineError("Only instances have properties.")
+
+                elif op == GET_SUPER:
+                    name = constants[code[ip]]
+                    ip += 1
+
+                    superclass = stack.pop()
+
+                    method = superclass.find_method(name)
+                    if method is None:
+                        raise VirtualMachineError(f"Undefined property '{name}'.")
+
+                    stack[-1] = BoundMethod(stack[-1], method)
+
+                elif op == CLOSURE:
+                    prototype = constants[code[ip]]
+                    ip += 1
+
+                    upvalues = []
+                    for _ in range(prototype.upvalue_count):
+                        is_local = code[ip]
+                        index = code[ip + 1]
+                        ip += 2
+
+                        if is_local:
+                            location = base + index
+
+                            upvalue = open_upvalues.get(location)
+                            if upvalue is None:
+                                upvalue = open_upvalues[location] = Upvalue(stack, location)
+                        else:
+                            upvalue = closure.upvalues[index]
+
+                        upvalues.append(upvalue)
+
+                    stack.append(Closure(prototype, upvalues))
+
+                elif op == CLOSE_UPVALUE:
+                    upvalue = open_upvalues.pop(len(stack) - 1, None)
+                    if upvalue is not None:
+                        upvalue.close()
+
+                    stack.pop()
+
+                elif op == CLASS:
+                    stack.append(LoxClass(constants[code[ip]], None, {}))
+                    ip += 1
+
+                elif op == INHERIT:
+                    klass = stack.pop()
+                    superclass = stack[-1]
+
+                    if not isinstance(superclass, LoxClass):
+                        raise VirtualMachineError("Superclass must be a class.")
+
+                    klass.inherit(superclass)
+
+                elif op == METHOD:
+                    method = stack.pop()
+                    stack[-1].define_method(constants[code[ip]], method)
+                    ip += 1
+
+                else:
+                    raise NotImplementedError(f"unknown opcode: {op}")
+        except VirtualMachineError as error:
+            error.line = closure.function.chunk.lines[ip - 1]
+            raise
+
+    def close_upvalues(self, open_upvalues: typing.Dict[int, Upvalue], last: int):
+        for location in [location for location in open_upvalues if location >= last]:
+            open_upvalues.pop(location).close()
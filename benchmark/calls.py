@@ -0,0 +1,72 @@
+import contextlib
+import io
+import sys
+import time
+
+from app.evaluation import Interpreter
+from app.parser import PrattParser
+from app.resolver import Resolver
+from app.scanner import FastScanner
+
+PRELUDE = """
+fun zero() { return 0; }
+fun one(a) { return a; }
+fun three(a, b, c) { return a; }
+class Point { init(x, y) { this.x = x; } }
+var i = 0;
+"""
+
+# the same loop around each kind of call, the empty one measures the loop itself
+CALLS = {
+    "loop": "nil",
+    "zero": "zero()",
+    "one": "one(i)",
+    "three": "three(i, i, i)",
+    "class": "Point(i, i)",
+    "native": "clock()",
+}
+
+LOOP = "while (i < %d) { %s; i = i + 1; }"
+
+
+def build(source: str):
+    statements = PrattParser(FastScanner(source).scan_buffer()).parse()
+    Resolver().resolve_statements(statements)
+
+    return statements
+
+
+def measure(statements: list):
+    interpreter = Interpreter()
+
+    start = time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        interpreter.interpret(statements)
+
+    return time.process_time() - start
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    repeat = 7
+
+    programs = {
+        name: build(PRELUDE + LOOP % (calls, expression))
+        for name, expression in CALLS.items()
+    }
+
+    # interleaved, keeping the best run of each
+    timings = dict.fromkeys(programs, float("inf"))
+    for _ in range(repeat):
+        for name, statements in programs.items():
+            timings[name] = min(timings[name], measure(statements))
+
+    loop = timings.pop("loop")
+    print(f"{'loop':>6}: {loop:6.3f}s for {calls} iterations")
+
+    for name, elapsed in timings.items():
+        print(f"{name:>6}: {elapsed:6.3f}s, {(elapsed - loop) / calls * 1e6:5.2f}us per call over the loop")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import contextlib
+import io
+import sys
+import time
+import tracemalloc
+
+from app.evaluation import Interpreter
+from app.parser import PrattParser
+from app.resolver import Resolver
+from app.scanner import FastScanner
+
+SOURCE = """
+class Tree {
+  init(left, right) { this.left = left; this.right = right; }
+  check() {
+    if (this.left == nil) return 1;
+    return 1 + this.left.check() + this.right.check();
+  }
+}
+
+fun make(depth) {
+  if (depth == 0) return Tree(nil, nil);
+  return Tree(make(depth - 1), make(depth - 1));
+}
+
+var tree = make(%d);
+print tree.check();
+"""
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 14
+    nodes = 2 ** (depth + 1) - 1
+
+    statements = PrattParser(FastScanner(SOURCE % depth).scan_buffer()).parse()
+    Resolver().resolve_statements(statements)
+
+    interpreter = Interpreter()
+
+    # the tree stays alive in the globals, so what is left allocated after the run is mostly its instances
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+
+    start = time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        interpreter.interpret(statements)
+    elapsed = time.process_time() - start
+
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{nodes} instances: {(after - before) / nodes:6.1f} bytes per instance, peak {peak / 2 ** 20:6.2f}MiB, {elapsed:6.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import contextlib
+import io
+import sys
+import time
+import tracemalloc
+
+from app.evaluation import Interpreter
+from app.parser import Parser
+from app.resolver import Resolver
+from app.scanner import FastScanner
+
+
+class NoSymbols(dict):
+
+    def setdefault(self, key, default=None):
+        return default
+
+
+def generate(classes: int, calls: int):
+    lines = []
+
+    for index in range(classes):
+        lines.append(f"class Doughnut{index} {{")
+        lines.append(f"  cook(amount) {{ this.amount = amount; return this.glaze(amount); }}")
+        lines.append(f"  glaze(amount) {{ this.glazed = amount * 2; return this.glazed; }}")
+        lines.append("}")
+        lines.append(f"class BostonCream{index} < Doughnut{index} {{")
+        lines.append(f"  cook(amount) {{ return super.cook(amount) + this.amount; }}")
+        lines.append("}")
+
+    lines.append("var total = 0;")
+    for index in range(classes):
+        lines.append(f"var cream{index} = BostonCream{index}();")
+        lines.append(f"for (var i = 0; i < {calls}; i = i + 1) {{ total = total + cream{index}.cook(i); }}")
+
+    lines.append("print total;")
+    return "\n".join(lines)
+
+
+def build(source: str, interning: bool):
+    scanner = FastScanner(source)
+    if not interning:
+        scanner.symbols = NoSymbols()
+
+    statements = Parser(scanner.scan_tokens()).parse()
+
+    Resolver().resolve_statements(statements)
+
+    return Interpreter(), statements
+
+
+def main():
+    classes = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    calls = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    source = generate(classes, calls)
+
+    for interning in (False, True):
+        tracemalloc.start()
+        interpreter, statements = build(source, interning)
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            interpreter.interpret(statements)
+        elapsed = time.perf_counter() - start
+
+        label = "interned" if interning else "fresh"
+        print(f"{label:>8}: front end {size / 1024:9.1f} KiB, run {elapsed:6.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import contextlib
+import io
+import sys
+import time
+
+from app.evaluation import Interpreter
+from app.parser import PrattParser
+from app.resolver import Resolver
+from app.scanner import FastScanner
+
+SOURCE = """
+class Counter {
+  init() { this.count = 0; }
+  increment(by) { this.count = this.count + by; return this; }
+}
+
+var counter = Counter();
+var i = 0;
+while (i < %d) {
+  counter.increment(1);
+  i = i + 1;
+}
+
+print counter.count;
+"""
+
+
+class BindingInterpreter(Interpreter):
+    """Calls methods by reading a bound method first, like before the `Call(Get(...))` fusion."""
+
+    def visit_call(self, call):
+        return self.call(call, self.evaluate(call.callee))
+
+
+def build(calls: int):
+    statements = PrattParser(FastScanner(SOURCE % calls).scan_buffer()).parse()
+    Resolver().resolve_statements(statements)
+
+    return statements
+
+
+def measure(interpreter_type: type, statements: list):
+    interpreter = interpreter_type()
+
+    start = time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        interpreter.interpret(statements)
+
+    return time.process_time() - start
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    repeat = 7
+
+    statements = build(calls)
+    interpreters = {"bound": BindingInterpreter, "fused": Interpreter}
+
+    # interleaved, keeping the best run of each
+    best = dict.fromkeys(interpreters, float("inf"))
+    for _ in range(repeat):
+        for name, interpreter_type in interpreters.items():
+            best[name] = min(best[name], measure(interpreter_type, statements))
+
+    for name, elapsed in best.items():
+        print(f"{name:>6}: {elapsed:6.3f}s for {calls} calls, {elapsed / calls * 1e6:5.2f}us per call")
+
+
+if __name__ == "__main__":
+    main()
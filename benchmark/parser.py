@@ -0,0 +1,58 @@
+import random
+import sys
+import time
+
+from app.parser import Parser, PrattParser
+from app.scanner import FastScanner
+
+OPERATORS = ["+", "-", "*", "/", "==", "!=", "<", "<=", ">", ">=", "and", "or"]
+
+
+def generate_expression(depth: int):
+    if depth == 0 or random.random() < 0.3:
+        return random.choice(["a", "1", "2.5", "\"s\"", "true", "nil", "b.c", "f(a)"])
+
+    if random.random() < 0.1:
+        return f"-({generate_expression(depth - 1)})"
+
+    operator = random.choice(OPERATORS)
+    return f"{generate_expression(depth - 1)} {operator} {generate_expression(depth - 1)}"
+
+
+def max_nesting(parser_type: type):
+    low, high = 1, 10000
+
+    while low < high:
+        middle = (low + high + 1) // 2
+        source = "(" * middle + "1" + ")" * middle
+
+        try:
+            parser_type(FastScanner(source).scan_tokens()).parse_expression()
+            low = middle
+        except RecursionError:
+            high = middle - 1
+
+    return low
+
+
+def main():
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    random.seed(0)
+    source = "\n".join(
+        f"print {generate_expression(6)};"
+        for _ in range(statements)
+    )
+
+    tokens = FastScanner(source).scan_tokens()
+
+    for name, parser_type in (("descent", Parser), ("pratt", PrattParser)):
+        start = time.perf_counter()
+        parser_type(tokens).parse()
+        elapsed = time.perf_counter() - start
+
+        print(f"{name:>8}: {elapsed:6.3f}s for {len(tokens)} tokens, max nesting {max_nesting(parser_type)}")
+
+
+if __name__ == "__main__":
+    main()
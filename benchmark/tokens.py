@@ -0,0 +1,54 @@
+import dataclasses
+import sys
+import tracemalloc
+import typing
+
+from app.grammar import Token, TokenType
+from app.scanner import FastScanner
+
+
+@dataclasses.dataclass
+class DictToken:
+    type: TokenType
+    lexeme: str
+    literal: typing.Any
+    line: int
+
+
+def measure(build: typing.Callable[[], typing.Any]):
+    tracemalloc.start()
+    tokens = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return size, tokens
+
+
+def main():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as file:
+            source = file.read()
+    else:
+        source = "\n".join(
+            f"var value{index % 100} = {index} * 2 + 1; print \"line\" + value{index % 100};"
+            for index in range(20000)
+        )
+
+    def dict_tokens():
+        return [
+            DictToken(token.type, token.lexeme, token.literal, token.line)
+            for token in FastScanner(source).iterate_tokens()
+        ]
+
+    results = [
+        ("dict Token", *measure(dict_tokens)),
+        ("slots Token", *measure(lambda: FastScanner(source).scan_tokens())),
+        ("TokenBuffer", *measure(lambda: FastScanner(source).scan_buffer())),
+    ]
+
+    for name, size, tokens in results:
+        print(f"{name:>12}: {size / len(tokens):7.2f} bytes/token ({len(tokens)} tokens)")
+
+
+if __name__ == "__main__":
+    main()